@@ -0,0 +1,136 @@
+"""
+Compares generated skeletons against a directory of reference skeletons without opening the UI.
+
+Usage:
+    python -m source.BatchComparison {reference directory} {results directory} {pipeline key} [--output file.csv] [--workers N] [--densify]
+
+Reference images use the same {sample name}_{timestep}.{png or tif} naming as the input images
+and are matched to the calculations files (_calculations.npz, or _calculations.json from older
+versions) in the results directory by sample and timestep.
+"""
+
+import argparse
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from source.Helpers.HelperFunctions import timestampKey, sampleKey
+from source.Helpers.SkeletonComparison import LoadReferenceSkeleton, CompareToReference, comparisonResultKeys
+from source.Helpers.CSVCreator import WriteCSV
+from source.Helpers.ResultStore import CalculationsPath, CalculationsBaseName, IsCalculationsFile, LoadCalculationsMetadata, LoadCalculationsPipeline, calculationsReadErrors
+
+def GetSampleAndTimestamp(fileName:str) -> tuple[str, int]:
+    #{sample name}_{timestep}.{extension}
+    fileNameParts = os.path.splitext(fileName)[0].split("_")
+    return "_".join(fileNameParts[:-1]), int(fileNameParts[-1])
+
+def GetReferenceFiles(referenceDirectory:str) -> dict[tuple[str, int], str]:
+    referenceFiles = {}
+
+    for fileName in sorted(os.listdir(referenceDirectory)):
+        if not fileName.endswith(".tif") and not fileName.endswith(".png"):
+            continue
+
+        try:
+            referenceFiles[GetSampleAndTimestamp(fileName)] = os.path.join(referenceDirectory, fileName)
+        except ValueError:
+            print(f"Skipping {fileName}, expected {{sample name}}_{{timestep}}")
+
+    return referenceFiles
+
+def GetCalculationsFiles(resultsDirectory:str) -> dict[tuple[str, int], str]:
+    #accepts the output directory or its Calculations directory
+    if os.path.isdir(os.path.join(resultsDirectory, "Calculations")):
+        resultsDirectory = os.path.join(resultsDirectory, "Calculations")
+
+    calculationsFiles = {}
+
+    #each image once, preferring its result store over an exported JSON file
+    baseFileNames = sorted({CalculationsBaseName(fileName) for fileName in os.listdir(resultsDirectory) if IsCalculationsFile(fileName)})
+
+    for baseFileName in baseFileNames:
+        filePath = CalculationsPath(resultsDirectory, baseFileName)
+
+        #one unreadable file (left by a crash, or not a calculations file) shouldn't stop the comparison
+        try:
+            calculations = LoadCalculationsMetadata(filePath)
+            calculationsFiles[(calculations[sampleKey], int(calculations[timestampKey]))] = filePath
+        except calculationsReadErrors as exception:
+            print(f"Skipping {os.path.basename(filePath)}, couldn't read it: {exception}")
+
+    return calculationsFiles
+
+def CompareFile(referencePath:str, calculationsPath:str, pipelineKey:str, densify:bool) -> dict:
+    #runs in a worker process
+    if pipelineKey not in LoadCalculationsMetadata(calculationsPath):
+        raise KeyError(f"{os.path.basename(calculationsPath)} has no results for pipeline {pipelineKey}")
+
+    pipelineResults = LoadCalculationsPipeline(calculationsPath, pipelineKey)
+    referenceSkeleton, referenceLines, referencePoints = LoadReferenceSkeleton(referencePath)
+
+    return CompareToReference(pipelineResults, referenceSkeleton, referenceLines, referencePoints, densify)
+
+def RunBatchComparison(referenceDirectory:str, resultsDirectory:str, pipelineKey:str, outputPath:str, maxWorkers:int=None, densify:bool=False) -> None:
+    startTime = time.perf_counter()
+
+    referenceFiles = GetReferenceFiles(referenceDirectory)
+    calculationsFiles = GetCalculationsFiles(resultsDirectory)
+
+    matchedKeys = sorted(set(referenceFiles) & set(calculationsFiles))
+    print(f"Matched {len(matchedKeys)} of {len(referenceFiles)} reference skeletons to generated results")
+
+    rows = {}
+    failures = 0
+
+    with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        futures = {executor.submit(CompareFile, referenceFiles[key], calculationsFiles[key], pipelineKey, densify): key for key in matchedKeys}
+
+        for i, future in enumerate(as_completed(futures)):
+            key = futures[future]
+
+            try:
+                rows[key] = future.result()
+            except Exception as exception:
+                failures += 1
+                print(f"Failed to compare {os.path.basename(referenceFiles[key])}: {exception}")
+                continue
+
+            print(f"Compared {os.path.basename(referenceFiles[key])} ({i + 1}/{len(matchedKeys)})")
+
+    csvData = [["sample", "timestep", "referenceFile", "calculationsFile"] + comparisonResultKeys]
+    for key in matchedKeys:
+        if key not in rows:
+            continue
+
+        sample, timestep = key
+        csvData.append([sample, timestep, referenceFiles[key], calculationsFiles[key]] + [rows[key][resultKey] for resultKey in comparisonResultKeys])
+
+    outputDirectory = os.path.dirname(outputPath)
+    if outputDirectory != "":
+        os.makedirs(outputDirectory, exist_ok=True)
+
+    WriteCSV(csvData, outputPath)
+
+    elapsedTime = time.perf_counter() - startTime
+    print(f"Wrote {len(rows)} comparisons to {outputPath}")
+    print(f"Compared {len(rows)} skeletons in {elapsedTime:.2f}s ({len(rows) / max(elapsedTime, 1e-9):.2f} skeletons/s), {failures} failed, {len(referenceFiles) - len(matchedKeys)} references had no generated results")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare generated skeletons to a directory of reference skeletons.")
+    parser.add_argument("referenceDirectory", help="directory of reference skeleton images named {sample name}_{timestep}")
+    parser.add_argument("resultsDirectory", help="output directory of the tool, or its Calculations directory")
+    parser.add_argument("pipelineKey", help="skeleton pipeline to compare, as it appears in the calculations files")
+    parser.add_argument("--output", default=None, help="CSV file to write, defaults to {results directory}/comparison_{pipeline key}.csv")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("--densify", action="store_true", help="sample points along the lines for the distance metrics")
+    args = parser.parse_args()
+
+    outputPath = args.output
+    if outputPath is None:
+        outputPath = os.path.join(args.resultsDirectory, f"comparison_{args.pipelineKey}.csv")
+
+    RunBatchComparison(args.referenceDirectory, args.resultsDirectory, args.pipelineKey, outputPath, args.workers, args.densify)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from PySide6.QtWidgets import QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLineEdit, QFileDialog, QLabel, QComboBox, QApplication
+from PySide6.QtWidgets import QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLineEdit, QFileDialog, QLabel, QComboBox, QApplication, QCheckBox
 from PySide6.QtGui import QPixmap, QColor
 from PySide6.QtCore import Qt, Signal
 
@@ -8,9 +8,11 @@ import os
 
 from PIL import Image
 
-from source.Helpers.HelperFunctions import draw_lines_on_pixmap, ArrayToPixmap, originalImageKey, vectorKey, pointsKey, linesKey, NormalizeImageArray, comparisonFunctionMap, camel_case_to_capitalized
+from source.Helpers.HelperFunctions import draw_lines_on_pixmap, ArrayToPixmap, originalImageKey, vectorKey, pointsKey, linesKey, comparisonFunctionMap, camel_case_to_capitalized
+from source.Helpers.HelperFunctions import rasterComparisonKeys, rasterComparisonTolerance
 
-from source.Helpers.CreateSkeleton import CallSkeletonize, VectorizeSkeleton
+from source.Helpers.ImageLoader import LoadNormalizedImage
+from source.Helpers.SkeletonComparison import LoadReferenceSkeleton, CompareVectors, CompareRasters
 
 class ComparisonWindow(QWidget):
 	BackToOverview = Signal()
@@ -27,6 +29,7 @@ class ComparisonWindow(QWidget):
 
 		self.uploadedLines = None
 		self.uploadedPoints = None
+		self.uploadedSkeleton = None
 
 		self.currentlyOverlaying = False
 
@@ -104,14 +107,25 @@ class ComparisonWindow(QWidget):
 			statsLayout.addWidget(currentLabel)
 			self.comparisonStatsLabels[comparisonStatsKey] = currentLabel
 
+		for rasterComparisonKey in rasterComparisonKeys:
+			currentLabel = QLabel(camel_case_to_capitalized(rasterComparisonKey) + ": N/A")
+			statsLayout.addWidget(currentLabel)
+			self.comparisonStatsLabels[rasterComparisonKey] = currentLabel
+
+		statsLayout.addWidget(QLabel(f"Note: Precision, recall and F1 score match pixels within {rasterComparisonTolerance:g} pixels"))
+
+		#compare points sampled along the lines instead of only the simplified vertices
+		self.densifyCheckBox = QCheckBox("Sample Points Along Lines")
+		self.densifyCheckBox.toggled.connect(self.UpdateComparisonStats)
+		statsLayout.addWidget(self.densifyCheckBox)
+
 	def SetImage(self, currentResults:dict, currSkeletonKey:str) -> None:
 		self.currentResults = currentResults
 		self.skeletonType = currSkeletonKey
 
 		#upload input image
 		inputImagePath = currentResults["originalImage"]
-		inputImageArray = np.asarray(Image.open(inputImagePath), dtype=np.float64)
-		inputImageArray = NormalizeImageArray(inputImageArray)
+		inputImageArray = LoadNormalizedImage(inputImagePath, grayscale=True)
 		inputImagePixmap = ArrayToPixmap(inputImageArray, dimension=self.imageResolution)
 		self.inputImageLabel.setPixmap(inputImagePixmap)
 
@@ -139,25 +153,30 @@ class ComparisonWindow(QWidget):
 		filePath = filePath.replace("\\", "/")
 		self.fileSelectLabel.setText(filePath)
 
-		uploadedImageArray = np.asarray(Image.open(filePath), dtype=np.float64)
-		uploadedImageArray = NormalizeImageArray(uploadedImageArray)
-
-		uploadedSkeleton = CallSkeletonize(uploadedImageArray, {})
-		self.uploadedLines, self.uploadedPoints, _ = VectorizeSkeleton(uploadedSkeleton)
+		self.uploadedSkeleton, self.uploadedLines, self.uploadedPoints = LoadReferenceSkeleton(filePath)
 
 		uploadedPixmap = draw_lines_on_pixmap(self.uploadedPoints, self.uploadedLines, dimension=self.imageResolution)
 		self.uploadedImageLabel.setPixmap(uploadedPixmap)
 
-		#perform calculations
-		for comparisonStatKey in self.comparisonStatsLabels:
-			result = comparisonFunctionMap[comparisonStatKey](
-				(self.currentResults[self.skeletonType][vectorKey][linesKey], self.currentResults[self.skeletonType][vectorKey][pointsKey]),
-				(self.uploadedLines, self.uploadedPoints)
-			)
+		self.uploadedFile = True
 
-			self.comparisonStatsLabels[comparisonStatKey].setText(f"{camel_case_to_capitalized(comparisonStatKey)}: {result}")
+		self.UpdateComparisonStats()
+		self.UpdateRasterComparisonStats()
 
-		self.uploadedFile = True
+	def UpdateComparisonStats(self) -> None:
+		if not self.uploadedFile:
+			return
+
+		results = CompareVectors(self.currentResults[self.skeletonType], self.uploadedLines, self.uploadedPoints, self.densifyCheckBox.isChecked())
+
+		for comparisonStatKey in comparisonFunctionMap:
+			self.comparisonStatsLabels[comparisonStatKey].setText(f"{camel_case_to_capitalized(comparisonStatKey)}: {results[comparisonStatKey]}")
+
+	def UpdateRasterComparisonStats(self) -> None:
+		scores = CompareRasters(self.currentResults[self.skeletonType], self.uploadedSkeleton, self.uploadedLines, self.uploadedPoints)
+
+		for rasterComparisonKey in rasterComparisonKeys:
+			self.comparisonStatsLabels[rasterComparisonKey].setText(f"{camel_case_to_capitalized(rasterComparisonKey)}: {scores[rasterComparisonKey]}")
 
 	def ToggleOverlay(self) -> None:
 		if not self.uploadedFile:
@@ -189,6 +208,7 @@ class ComparisonWindow(QWidget):
 
 		self.uploadedLines = None
 		self.uploadedPoints = None
+		self.uploadedSkeleton = None
 
 		self.currentlyOverlaying = False
 
@@ -0,0 +1,41 @@
+"""
+Writes the pretty-printed _calculations.json file for every result store in an output directory.
+
+Usage:
+    python -m source.ExportCalculations {output directory}
+
+The JSON files have the same layout older versions saved, for scripts that read them directly.
+The program itself only needs the _calculations.npz result stores.
+"""
+
+import argparse
+import os
+
+from source.Helpers.ResultStore import ExportCalculationsJSON, calculationsStoreSuffix
+
+def ExportDirectory(outputDirectory:str) -> int:
+    #accepts the output directory or its Calculations directory
+    if os.path.isdir(os.path.join(outputDirectory, "Calculations")):
+        outputDirectory = os.path.join(outputDirectory, "Calculations")
+
+    exportedFiles = 0
+
+    for fileName in sorted(os.listdir(outputDirectory)):
+        if not fileName.endswith(calculationsStoreSuffix):
+            continue
+
+        ExportCalculationsJSON(os.path.join(outputDirectory, fileName))
+        exportedFiles += 1
+
+    return exportedFiles
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export result stores to the JSON files older versions saved.")
+    parser.add_argument("outputDirectory", help="output directory of the tool, or its Calculations directory")
+    args = parser.parse_args()
+
+    exportedFiles = ExportDirectory(args.outputDirectory)
+    print(f"Exported {exportedFiles} calculations files")
+
+if __name__ == "__main__":
+    main()
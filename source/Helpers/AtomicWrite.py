@@ -0,0 +1,29 @@
+import json
+import os
+import threading
+
+from contextlib import contextmanager
+
+@contextmanager
+def AtomicWritePath(path:str):
+    """
+    Yields a temporary path to write to, then renames it over path once the block finishes.
+
+    The rename replaces the file in one step, so readers and later runs see either the old
+    file or the complete new one, never a file cut short by a crash. The temporary file is
+    removed if the block raises.
+    """
+
+    temporaryPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        yield temporaryPath
+        os.replace(temporaryPath, path)
+    finally:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+
+def WriteJSONAtomically(data, path:str) -> None:
+    with AtomicWritePath(path) as temporaryPath:
+        with open(temporaryPath, "w") as jsonFile:
+            json.dump(data, jsonFile, indent=4)
@@ -0,0 +1,354 @@
+import numpy as np
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from PIL import Image
+
+from source.Helpers.HelperFunctions import skeletonKey, originalImageKey, timestampKey, sampleKey, fingerprintKey, statFunctionMap, statFunctionMapVersion
+from source.Helpers.CreateSkeleton import GenerateSkeletons, fullPrecision
+from source.Helpers.CSVCreator import GenerateCSVs
+from source.Helpers.StepCache import StepCache
+from source.Helpers.ImageLoader import imageCache
+from source.Helpers.AtomicWrite import AtomicWritePath, WriteJSONAtomically
+from source.Helpers.ResultStore import SaveResultStore, LoadCalculations, LoadCalculationsMetadata, CalculationsPath, ExportCalculationsJSON, IsJSONExportCurrent, calculationsStoreSuffix, calculationsJSONSuffix, calculationsReadErrors
+
+#environment variables read by the BLAS/OpenMP libraries numpy, scipy and scikit-image use
+threadLimitVariables = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS"]
+
+class SkeletonJobSettings:
+    """
+    Everything needed to create the skeletons for one image outside the UI.
+
+    pipelines maps each pipeline key to its (parameters, steps), the same as GenerateSkeletons.
+    Calculations are saved as a binary result store, exportJSON also saves the JSON file older
+    versions wrote. statWorkers is the number of threads each image's stats run on, None uses
+    EvaluateStats' default.
+    """
+
+    def __init__(self, inputDirectory:str, outputDirectory:str, pipelines:dict[str, tuple[list[dict], list]], pipelineSteps:dict,
+                 stepCacheDirectory:str=None, stepCacheSizeBytes:int=0, precision:str=fullPrecision,
+                 compressResults:bool=True, exportJSON:bool=False, statWorkers:int=None) -> None:
+        self.inputDirectory = inputDirectory
+        self.outputDirectory = outputDirectory
+
+        self.pipelines = pipelines
+        self.pipelineSteps = pipelineSteps
+
+        self.stepCacheDirectory = stepCacheDirectory
+        self.stepCacheSizeBytes = stepCacheSizeBytes
+
+        self.precision = precision
+
+        self.compressResults = compressResults
+        self.exportJSON = exportJSON
+
+        self.statWorkers = statWorkers
+
+def PipelineFingerprint(inputPath:str, parameters:list[dict], steps:list, pipelineSteps:dict, precision:str) -> str:
+    #changes when the input file, the pipeline's steps or parameters, the stats or the precision change
+    fileStats = os.stat(inputPath)
+    stepFunctionKeys = [pipelineSteps[step]["function"] for step in steps]
+
+    fingerprintData = json.dumps([statFunctionMapVersion, sorted(statFunctionMap), fileStats.st_size, fileStats.st_mtime_ns,
+                                  stepFunctionKeys, list(parameters[:len(steps)]), precision], sort_keys=True, default=str)
+    return hashlib.sha256(fingerprintData.encode("utf-8")).hexdigest()
+
+def LoadExistingResult(calculationsPath:str, metadataOnly:bool=False) -> dict:
+    #an unreadable file is treated as missing so everything is recomputed
+    if not os.path.exists(calculationsPath):
+        return {}
+
+    try:
+        existingResult = LoadCalculationsMetadata(calculationsPath) if metadataOnly else LoadCalculations(calculationsPath)
+    except calculationsReadErrors:
+        return {}
+
+    return existingResult if isinstance(existingResult, dict) else {}
+
+def IsUpToDate(pipelineResult, fingerprint:str) -> bool:
+    return isinstance(pipelineResult, dict) and pipelineResult.get(fingerprintKey) == fingerprint and os.path.exists(pipelineResult.get(skeletonKey, ""))
+
+def CreateSkeletonFiles(settings:SkeletonJobSettings, fileName:str, sample:str, stepCache:StepCache=None) -> list[str]:
+    """
+    Runs the pipelines on one image and saves the skeleton images, CSVs and calculations.
+
+    Pipelines whose saved results have a matching fingerprint are kept as they are, comments
+    included, and aren't run again. Returns the keys of the pipelines that were recomputed.
+    """
+
+    jsonResult = {}
+
+    jsonResult[originalImageKey] = os.path.join(settings.inputDirectory, fileName)
+
+    #save skeleton image file
+    baseFileName, extension = os.path.splitext(fileName)
+
+    calculationsDirectory = os.path.join(settings.outputDirectory, "Calculations")
+    storePath = os.path.join(calculationsDirectory, baseFileName + calculationsStoreSuffix)
+    jsonFilePath = os.path.join(calculationsDirectory, baseFileName + calculationsJSONSuffix)
+
+    #only the metadata is needed to decide what's out of date
+    existingPath = CalculationsPath(calculationsDirectory, baseFileName)
+    existingResult = LoadExistingResult(existingPath, metadataOnly=True)
+
+    fingerprints = {}
+    outdatedPipelines = {}
+    for currSkeletonKey, (parameters, steps) in settings.pipelines.items():
+        fingerprints[currSkeletonKey] = PipelineFingerprint(jsonResult[originalImageKey], parameters, steps, settings.pipelineSteps, settings.precision)
+
+        if not IsUpToDate(existingResult.get(currSkeletonKey), fingerprints[currSkeletonKey]):
+            outdatedPipelines[currSkeletonKey] = (parameters, steps)
+
+    #save JSON file for image
+    fileNameSplit:list[str] = os.path.splitext(fileName)[0].split("_")
+    timestamp = int(fileNameSplit[-1])
+
+    jsonResult[timestampKey] = timestamp
+    jsonResult[sampleKey] = sample
+
+    #nothing to write if every pipeline is current and the file has no extra pipelines or a different sample
+    existingSkeletonKeys = [key for key in existingResult if isinstance(existingResult[key], dict) and skeletonKey in existingResult[key]]
+    if len(outdatedPipelines) == 0 and set(existingSkeletonKeys) == set(settings.pipelines) and existingResult.get(sampleKey) == sample:
+        #the results are current but the JSON export may be missing or from before the store last changed
+        if settings.exportJSON and os.path.exists(storePath) and not IsJSONExportCurrent(storePath, jsonFilePath):
+            ExportCalculationsJSON(storePath, jsonFilePath)
+
+        return []
+
+    #the up to date pipelines are saved again, so their arrays are needed too
+    if len(outdatedPipelines) < len(settings.pipelines):
+        existingResult = LoadExistingResult(existingPath)
+
+    #get results from skeleton creator, steps shared between pipelines only run once
+    skeletonResults = {}
+    if len(outdatedPipelines) > 0:
+        skeletonResults = GenerateSkeletons(settings.inputDirectory, fileName, outdatedPipelines, settings.pipelineSteps, stepCache=stepCache, precision=settings.precision, statWorkers=settings.statWorkers)
+
+    for currSkeletonKey in settings.pipelines:
+        if currSkeletonKey not in outdatedPipelines:
+            jsonResult[currSkeletonKey] = existingResult[currSkeletonKey]
+            continue
+
+        skeletonResult = skeletonResults[currSkeletonKey]
+
+        newBaseFileName = baseFileName + "_" + currSkeletonKey
+        newFileName = newBaseFileName + extension
+
+        imgArray = skeletonResult[skeletonKey]
+        img = Image.fromarray(np.asarray(imgArray * 255, dtype=np.uint8), mode="L")
+        img = img.convert("RGB")
+
+        with AtomicWritePath(os.path.join(settings.outputDirectory, newFileName)) as temporaryPath:
+            img.save(temporaryPath, format=Image.registered_extensions()[extension.lower()])
+
+        skeletonResult[skeletonKey] = os.path.join(settings.outputDirectory, newFileName)
+
+        skeletonResult["lineComments"] = {}
+        skeletonResult["clusterComments"] = {}
+        skeletonResult[fingerprintKey] = fingerprints[currSkeletonKey]
+
+        jsonResult[currSkeletonKey] = skeletonResult
+
+    GenerateCSVs(jsonResult, baseFileName, settings.outputDirectory)
+
+    #a crash before this leaves the previous results and fingerprints in place
+    SaveResultStore(jsonResult, storePath, settings.compressResults)
+
+    #written after the store, so an export that's missing or older than the store is redone on the next run
+    if settings.exportJSON:
+        WriteJSONAtomically(jsonResult, jsonFilePath)
+    elif os.path.exists(jsonFilePath):
+        #a JSON file left from an older version or an earlier export would be out of date
+        os.remove(jsonFilePath)
+
+    return list(outdatedPipelines)
+
+#set in each worker process by InitializeWorker
+workerSettings:SkeletonJobSettings = None
+workerStepCache:StepCache = None
+
+def InitializeWorker(settings:SkeletonJobSettings, threadsPerWorker:int) -> None:
+    global workerSettings, workerStepCache
+
+    workerSettings = settings
+
+    #each worker's stats share its thread budget instead of starting a pool per core
+    if workerSettings.statWorkers is None:
+        workerSettings.statWorkers = threadsPerWorker
+
+    if settings.stepCacheDirectory is not None:
+        workerStepCache = StepCache(settings.stepCacheDirectory, settings.stepCacheSizeBytes)
+
+    #each image is decoded once per worker, caching it would only hold memory in every worker
+    imageCache.SetMaxBytes(0)
+
+    #OpenCV has its own thread pool that ignores the BLAS/OpenMP variables
+    import cv2
+    cv2.setNumThreads(threadsPerWorker)
+
+def RunWorkerJob(fileName:str, sample:str) -> tuple[str, list[str], float]:
+    startTime = time.perf_counter()
+    updatedPipelines = CreateSkeletonFiles(workerSettings, fileName, sample, workerStepCache)
+
+    return fileName, updatedPipelines, time.perf_counter() - startTime
+
+@contextmanager
+def LimitThreads(threadsPerWorker:int):
+    #worker processes read these when they start, the current process's libraries are already initialized
+    previousValues = {variable: os.environ.get(variable) for variable in threadLimitVariables}
+
+    for variable in threadLimitVariables:
+        os.environ[variable] = str(threadsPerWorker)
+
+    try:
+        yield
+    finally:
+        for variable, value in previousValues.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+def DefaultWorkerCount() -> int:
+    return max(1, os.cpu_count() or 1)
+
+class SkeletonBatch:
+    """
+    Creates the skeletons for many images on a pool of worker processes.
+
+    Each worker handles one image at a time (decode, every pipeline, saving the results) with its
+    BLAS, OpenMP and OpenCV thread pools and its stat threads capped at threadsPerWorker, so maxWorkers workers use about
+    maxWorkers * threadsPerWorker cores. Iterate over Run() to get each image as it finishes.
+    Images whose saved results are already up to date count as completed and also in upToDate.
+
+    With a single worker or a single image, the images are created on the calling thread
+    instead, skipping the cost of starting a process.
+    """
+
+    def __init__(self, settings:SkeletonJobSettings, jobs:list[tuple[str, str]], maxWorkers:int=None, threadsPerWorker:int=1, stepCache:StepCache=None, journal=None) -> None:
+        #jobs are (file name, sample) pairs, stepCache is only used when running on the calling thread
+        #journal is an open RunJournal that records each finished image, it's closed when the run ends
+        self.settings = settings
+        self.jobs = jobs
+        self.stepCache = stepCache
+        self.journal = journal
+
+        self.maxWorkers = maxWorkers if maxWorkers is not None and maxWorkers > 0 else DefaultWorkerCount()
+        self.maxWorkers = min(self.maxWorkers, max(len(jobs), 1))
+        self.threadsPerWorker = max(1, threadsPerWorker)
+
+        self.completed = 0
+        self.failed = 0
+        self.upToDate = 0
+        self.startTime = None
+        self.cancelled = False
+
+        self.futures = []
+
+    def Run(self):
+        #yields (file name, error or None) as images finish, in completion order
+        self.startTime = time.perf_counter()
+
+        os.makedirs(os.path.join(self.settings.outputDirectory, "Calculations"), exist_ok=True)
+
+        jobResults = self.RunInProcess() if self.maxWorkers == 1 else self.RunInWorkers()
+
+        try:
+            for fileName, error in jobResults:
+                if error is None and self.journal is not None:
+                    self.journal.RecordCompleted(fileName, list(self.settings.pipelines))
+
+                yield fileName, error
+
+            #failed images are left unfinished so resuming retries them
+            if self.journal is not None and not self.cancelled and self.failed == 0:
+                self.journal.RecordFinished()
+        finally:
+            jobResults.close()
+
+            if self.journal is not None:
+                self.journal.Close()
+
+    def RunInProcess(self):
+        stepCache = self.stepCache
+        if stepCache is None and self.settings.stepCacheDirectory is not None:
+            stepCache = StepCache(self.settings.stepCacheDirectory, self.settings.stepCacheSizeBytes)
+
+        for fileName, sample in self.jobs:
+            if self.cancelled:
+                break
+
+            try:
+                updatedPipelines = CreateSkeletonFiles(self.settings, fileName, sample, stepCache)
+                error = None
+                self.completed += 1
+                self.upToDate += len(updatedPipelines) == 0
+            except Exception as exception:
+                error = exception
+                self.failed += 1
+
+            yield fileName, error
+
+    def RunInWorkers(self):
+        #spawn so workers don't inherit the UI's Qt state
+        context = multiprocessing.get_context("spawn")
+
+        with LimitThreads(self.threadsPerWorker):
+            executor = ProcessPoolExecutor(max_workers=self.maxWorkers, mp_context=context, initializer=InitializeWorker, initargs=(self.settings, self.threadsPerWorker))
+
+            try:
+                futures = {executor.submit(RunWorkerJob, fileName, sample): fileName for fileName, sample in self.jobs}
+                self.futures = list(futures)
+
+                if self.cancelled:
+                    self.CancelPendingJobs()
+
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+
+                    fileName = futures[future]
+
+                    try:
+                        _, updatedPipelines, _ = future.result()
+                        error = None
+                        self.completed += 1
+                        self.upToDate += len(updatedPipelines) == 0
+                    except Exception as exception:
+                        error = exception
+                        self.failed += 1
+
+                    yield fileName, error
+
+                    if self.cancelled:
+                        break
+            finally:
+                #jobs that haven't started are dropped, running ones finish writing their files
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def Cancel(self) -> None:
+        #safe to call from any thread, images that are already being created still finish
+        self.cancelled = True
+        self.CancelPendingJobs()
+
+    def CancelPendingJobs(self) -> None:
+        for future in self.futures:
+            future.cancel()
+
+    def Remaining(self) -> int:
+        return len(self.jobs) - self.completed - self.failed
+
+    def ElapsedTime(self) -> float:
+        if self.startTime is None:
+            return 0.0
+
+        return time.perf_counter() - self.startTime
+
+    def ImagesPerSecond(self) -> float:
+        elapsedTime = self.ElapsedTime()
+        return self.completed / elapsedTime if elapsedTime > 0 else 0.0
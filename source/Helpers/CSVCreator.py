@@ -1,5 +1,6 @@
 import csv
 import os
+from source.Helpers.AtomicWrite import AtomicWritePath
 from source.Helpers.HelperFunctions import skeletonKey, pointsKey, linesKey, clusterKey, statFunctionMap, vectorKey, functionTypeKey, imageTypeKey, lineTypeKey, clusterTypeKey
 
 def GenerateCSVs(jsonObject:dict, baseFileName:str, outputDirectory:str) -> None:
@@ -90,6 +91,7 @@ def GenerateCSVs(jsonObject:dict, baseFileName:str, outputDirectory:str) -> None
         WriteCSV(metadataData, metadataCSVPath)
 
 def WriteCSV(data:list, path:str) -> None:
-    with open(path, mode="w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerows(data)
\ No newline at end of file
+    with AtomicWritePath(path) as temporaryPath:
+        with open(temporaryPath, mode="w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerows(data)
\ No newline at end of file
@@ -1,5 +1,7 @@
 import numpy as np
 import os
+import copy
+import json
 from PIL import Image
 from scipy.ndimage import label
 from skimage.morphology import skeletonize
@@ -11,38 +13,36 @@ from skimage import feature
 
 from source.Helpers.VectorizeSkeleton import VectorizeSkeleton
 
-from source.Helpers.HelperFunctions import skeletonKey, statFunctionMap, vectorKey, pointsKey, linesKey, clusterKey, functionKey
-
-def count_black_neighbors(binary_array, x, y):
-    neighbors = binary_array[x-1:x+2, y-1:y+2]
-    return 8 - np.sum(neighbors, dtype=np.int64)  # count black (0) pixels
+from source.Helpers.HelperFunctions import skeletonKey, vectorKey, pointsKey, linesKey, clusterKey
+from source.Helpers.GeometryContext import GeometryContext
+from source.Helpers.StatEvaluation import EvaluateStats
+from source.Helpers.StepCache import StepCache
+from source.Helpers.ImageLoader import LoadNormalizedImage
 
 def remove_structurally_noisy_islands(binary_array, max_avg_black_neighbors=4.0):
     # Label connected white regions
     labeled_array, num_features = label(binary_array)
 
-    # Pad array to handle edges safely
-    padded_array = np.pad(binary_array, 1)
-    padded_labels = np.pad(labeled_array, 1)
-
-    output = np.zeros_like(binary_array)
+    # For every pixel, the sum of its 3x3 neighborhood (including itself), treating everything
+    # outside the image as black, added up a row and then a column at a time
+    padded = np.pad(np.asarray(binary_array) != 0, 1).view(np.uint8)
+    column_sums = padded[:-2] + padded[1:-1] + padded[2:]
+    neighbor_sums = column_sums[:, :-2] + column_sums[:, 1:-1] + column_sums[:, 2:]
 
-    for label_id in range(1, num_features + 1):
-        coords = np.argwhere(padded_labels == label_id)
-        black_neighbor_counts = []
+    # Sums are 0-9, so one count of (label, sum) pairs gives every island's size and total (label 0 is background)
+    counts = np.bincount((labeled_array.astype(np.intp) * 10 + neighbor_sums).ravel(), minlength=(num_features + 1) * 10)
+    counts = counts.reshape(num_features + 1, 10)
 
-        for x, y in coords:
-            black_neighbors = count_black_neighbors(padded_array, x, y)
-            black_neighbor_counts.append(black_neighbors)
+    # Each pixel has 8 minus its neighborhood sum black neighbors
+    island_sizes = counts.sum(axis=1)
+    island_totals = 8 * island_sizes - counts @ np.arange(10)
+    avg_black_neighbors = island_totals / np.maximum(island_sizes, 1)
 
-        avg_black_neighbors = np.mean(black_neighbor_counts)
+    # Lookup table of which labels to keep, background is never kept
+    keep_labels = avg_black_neighbors <= max_avg_black_neighbors
+    keep_labels[0] = False
 
-        if avg_black_neighbors <= max_avg_black_neighbors:
-            # Keep coherent island
-            for x, y in coords:
-                output[x - 1, y - 1] = 1  # remove padding offset
-
-    return output
+    return keep_labels.astype(np.asarray(binary_array).dtype)[labeled_array]
 
 def remove_small_white_islands(binary_array:np.ndarray, min_size):
     """
@@ -61,20 +61,18 @@ def remove_small_white_islands(binary_array:np.ndarray, min_size):
     # Count the number of pixels in each component (ignore label 0 which is background)
     component_sizes = np.bincount(labeled_array.ravel())
     
-    # Create a mask of components to keep
-    keep_labels = np.where(component_sizes >= min_size)[0]
-    
-    # Remove background (label 0) from the keep list
-    keep_labels = keep_labels[keep_labels != 0]
+    # Lookup table of which labels to keep, background (label 0) is never kept
+    keep_labels = component_sizes >= min_size
+    keep_labels[0] = False
     
     # Build a mask of all pixels to keep
-    cleaned_array = np.isin(labeled_array, keep_labels).astype(np.uint8)
+    cleaned_array = keep_labels[labeled_array].astype(np.uint8)
     
     return cleaned_array
 
 def radial_interpolation_array(width, height, center_value, edge_value):
-    # Create a grid of (x, y) coordinates
-    y, x = np.indices((height, width))
+    # Create (x, y) coordinates that broadcast to the full grid
+    y, x = np.ogrid[:height, :width]
     
     # Calculate the center of the array
     center_x = (width - 1) / 2
@@ -83,14 +81,15 @@ def radial_interpolation_array(width, height, center_value, edge_value):
     # Compute distance of each point to the center
     distances = np.sqrt((x - center_x)**2 + (y - center_y)**2)
     
-    # Normalize distances to the range [0, 1]
+    # Normalize distances to the range [0, 1], in place to avoid full size temporaries
     max_distance = np.sqrt(center_x**2 + center_y**2)
-    norm_distances = distances / max_distance
+    distances /= max_distance
     
     # Linearly interpolate between center_value and edge_value
-    result = center_value + (edge_value - center_value) * norm_distances
+    distances *= (edge_value - center_value)
+    distances += center_value
     
-    return result
+    return distances
 
 def smooth_binary_array(binary_array, sigma=1.0):
     """
@@ -167,47 +166,151 @@ def threshold_and_proximity(image, edgeDetection, maxThreshold, minThreshold, di
     #condition1 = np.logical_and(image < maxThreshold, image > minThreshold)
 
     size = 2 * distance + 1
-    edgeDetection = np.asarray(edgeDetection, dtype=np.float64)
+    edgeDetection = np.asarray(edgeDetection, dtype=image.dtype if np.issubdtype(image.dtype, np.floating) else np.float64)
     local_ratio = uniform_filter(edgeDetection, size=size, mode='constant')
 
     # Condition 2: ratio of 1s in neighborhood >= ratio_threshold
     condition2 = local_ratio >= ratioThreshold
 
     # Final result: element-wise AND of both conditions
-    result = np.logical_and(condition1, condition2).astype(np.float64)
+    result = np.logical_and(condition1, condition2).astype(edgeDetection.dtype)
 
     return result
 
-def GenerateSkeleton(directory:str, fileName:str, parameters:list[dict], steps:list, pipelineSteps:dict) -> dict:
+class PipelineNode:
+    """
+    One step in the prefix tree of all the pipelines run on an image.
+
+    Pipelines that start with the same steps and parameters share nodes, so each shared step
+    runs once. Every pipeline ends with a skeletonize node, pipelineKeys lists the pipelines
+    that end at a node.
+    """
+
+    def __init__(self, stepFunctionKey:str, parameters:dict, cacheKey:str=None) -> None:
+        self.stepFunctionKey = stepFunctionKey
+        self.parameters = parameters
+        self.cacheKey = cacheKey
+
+        self.children:dict[tuple[str, str], PipelineNode] = {}
+        self.pipelineKeys:list[str] = []
+
+    def GetChild(self, stepFunctionKey:str, parameters:dict, cacheKey:str=None) -> "PipelineNode":
+        childKey = (stepFunctionKey, json.dumps(parameters, sort_keys=True, default=str))
+
+        if childKey not in self.children:
+            self.children[childKey] = PipelineNode(stepFunctionKey, parameters, cacheKey)
+
+        return self.children[childKey]
+
+def PlanPipelines(pipelines:dict[str, tuple[list[dict], list]], pipelineSteps:dict, fileKey:str=None, precision:str=None) -> PipelineNode:
+    #pipelines maps each pipeline key to its (parameters, steps), fileKey starts the step cache key chain
+    if fileKey is not None and precision is not None and precision != fullPrecision:
+        #reduced precision intermediates are cached separately from full precision ones
+        fileKey = StepCache.StepKey(fileKey, "precision", {"precision": precision})
+
+    root = PipelineNode(None, {}, fileKey)
+
+    for pipelineKey, (parameters, steps) in pipelines.items():
+        stepFunctionKeys = [pipelineSteps[step]["function"] for step in steps] + ["skeletonize"]
+        stepParameters = list(parameters[:len(steps)]) + [{}]
+
+        node = root
+        for stepFunctionKey, currParameters in zip(stepFunctionKeys, stepParameters):
+            cacheKey = None
+            if fileKey is not None:
+                cacheKey = StepCache.StepKey(node.cacheKey, stepFunctionKey, currParameters)
+
+            node = node.GetChild(stepFunctionKey, currParameters, cacheKey)
+
+        node.pipelineKeys.append(pipelineKey)
+
+    return root
+
+def GenerateSkeletons(directory:str, fileName:str, pipelines:dict[str, tuple[list[dict], list]], pipelineSteps:dict, requestedStats:list[str]=None, stepCache:StepCache=None, precision:str=None, statWorkers:int=None) -> dict[str, dict]:
+    """
+    Runs every pipeline on one image and returns each pipeline's result by pipeline key.
+
+    The pipelines are planned as a prefix tree and each node runs once, so the image is
+    decoded once and steps shared by several pipelines aren't repeated. Step functions
+    must not modify their input since it can be shared between branches.
+
+    precision is fullPrecision (the default) or reducedPrecision, see precisionDataTypes.
+    statWorkers caps the threads each skeleton's stats run on, see EvaluateStats.
+    """
+    if precision is None:
+        precision = fullPrecision
+
     if not fileName.endswith(".tif") and not fileName.endswith(".png"):
         return None
-    
+
     filePath = os.path.join(directory, fileName)
-    img = Image.open(filePath)
 
-    originalImageArray = np.asarray(img, dtype=np.float64)
+    fileKey = stepCache.FileKey(filePath) if stepCache is not None else None
+    root = PlanPipelines(pipelines, pipelineSteps, fileKey, precision)
+
+    results = {}
+
+    def RunNode(node:PipelineNode, GetInput) -> None:
+        output = None
+
+        #only computed when this node or one below it isn't cached
+        def GetOutput() -> np.ndarray:
+            nonlocal output
+
+            if output is None and stepCache is not None:
+                output = stepCache.Get(node.cacheKey)
+
+            if output is None:
+                output = RunStep(node.stepFunctionKey, GetInput(), node.parameters, precision)
+
+                if stepCache is not None:
+                    stepCache.Put(node.cacheKey, output)
+
+            return output
+
+        if len(node.pipelineKeys) > 0:
+            result = CreateSkeletonResult(GetOutput(), GetInput(), requestedStats, precision, statWorkers)
+
+            for i, pipelineKey in enumerate(node.pipelineKeys):
+                results[pipelineKey] = result if i == 0 else copy.deepcopy(result)
+
+        for child in node.children.values():
+            RunNode(child, GetOutput)
+
+    #decoded once, the first time a step needs it
+    normalizedImage = None
+
+    def GetNormalizedImage() -> np.ndarray:
+        nonlocal normalizedImage
 
-    imgArray = np.asarray(img, dtype=np.float64)
+        if normalizedImage is None:
+            normalizedImage = LoadNormalizedImage(filePath, dataType=np.float64 if precision == fullPrecision else np.float32)
 
-    maxValue = np.max(imgArray)
-    minValue = np.min(imgArray)
-    imgArray -= minValue
-    maxValue -= minValue
-    imgArray /= maxValue
+        return normalizedImage
 
-    originalImageArray -= minValue
-    originalImageArray /= maxValue
+    for child in root.children.values():
+        RunNode(child, GetNormalizedImage)
 
-    #call all the functions
-    for i, step in enumerate(steps):
-        stepFunctionKey = pipelineSteps[step]["function"]
+    print(f"Created skeletons for {fileName}")
 
-        imgArray = stepFunctionMap[stepFunctionKey](imgArray, parameters[i])
+    return {pipelineKey: results[pipelineKey] for pipelineKey in pipelines}
 
-    skeletonImg = stepFunctionMap["skeletonize"](imgArray, {})
+def GenerateSkeleton(directory:str, fileName:str, parameters:list[dict], steps:list, pipelineSteps:dict, requestedStats:list[str]=None, stepCache:StepCache=None, precision:str=None) -> dict:
+    results = GenerateSkeletons(directory, fileName, {"": (parameters, steps)}, pipelineSteps, requestedStats, stepCache, precision)
 
+    if results is None:
+        return None
+
+    return results[""]
+
+def CreateSkeletonResult(skeletonImg:np.ndarray, imgBeforeSkeleton:np.ndarray, requestedStats:list[str]=None, precision:str=None, statWorkers:int=None) -> dict:
     result = {}
-    result[skeletonKey] = np.asarray(skeletonImg, dtype=np.float64)
+
+    #the skeleton is only saved as an image, reduced precision keeps it as a mask
+    if precision is None or precision == fullPrecision:
+        result[skeletonKey] = np.asarray(skeletonImg, dtype=np.float64)
+    else:
+        result[skeletonKey] = np.asarray(skeletonImg, dtype=np.bool_)
 
     lines, points, clusters = VectorizeSkeleton(skeletonImg)
 
@@ -219,17 +322,18 @@ def GenerateSkeleton(directory:str, fileName:str, parameters:list[dict], steps:l
 
     result[vectorKey] = vectors
 
-    for key in statFunctionMap:
-        result[key] = statFunctionMap[key][functionKey](skeletonImg, imgArray, lines, points, clusters)
-        
-    print(f"Created skeleton for {fileName}")
+    #geometry shared between the stat functions, computed as they need it
+    context = GeometryContext(skeletonImg, imgBeforeSkeleton, lines, points, clusters, reducedPrecision=precision == reducedPrecision)
+
+    #requestedStats=None computes every stat in statFunctionMap
+    result.update(EvaluateStats(context, requestedStats, maxWorkers=statWorkers))
 
     return result
 
 def RadialThreshold(imgArray:np.ndarray, parameters:dict) -> np.ndarray:
     thresholds = radial_interpolation_array(imgArray.shape[1], imgArray.shape[0], parameters["centerThreshold"], parameters["edgeThreshold"])
 
-    imgArray = np.asarray(imgArray < thresholds, dtype=np.float64)
+    imgArray = np.asarray(imgArray < thresholds, dtype=imgArray.dtype if np.issubdtype(imgArray.dtype, np.floating) else np.float64)
 
     return imgArray
 
@@ -268,4 +372,51 @@ stepFunctionMap = {
     "skeletonize": CallSkeletonize,
     "adjustContrast": CallAdjustContrast,
     "edgeDetection": CallEdgeDetection
-}
\ No newline at end of file
+}
+
+#kinds of image a step accepts and returns
+grayscaleDataKey = "grayscale"
+maskDataKey = "mask"
+
+stepDataTypes = {
+    "radialThreshold": (grayscaleDataKey, maskDataKey),
+    "removeSmallWhiteIslands": (maskDataKey, maskDataKey),
+    "removeStructurallyNoisyIslands": (maskDataKey, maskDataKey),
+    "smoothBinaryArray": (maskDataKey, maskDataKey),
+    "skeletonize": (maskDataKey, maskDataKey),
+    "adjustContrast": (grayscaleDataKey, grayscaleDataKey),
+    "edgeDetection": (grayscaleDataKey, maskDataKey)
+}
+
+#full precision keeps every intermediate as float64, reduced precision stores grayscale
+#images as float32 and masks as bool, using 2x to 8x less memory per image
+fullPrecision = "full"
+reducedPrecision = "reduced"
+
+precisionDataTypes = {
+    fullPrecision: None,
+    reducedPrecision: {
+        grayscaleDataKey: np.float32,
+        maskDataKey: np.bool_
+    }
+}
+
+def ToDataType(imgArray:np.ndarray, dataKey:str, precision:str) -> np.ndarray:
+    dataTypes = precisionDataTypes[precision]
+    if dataTypes is None or dataKey is None:
+        return imgArray
+
+    #masks are any non-zero pixel, the same as scipy's label
+    if dataKey == maskDataKey and imgArray.dtype != np.bool_:
+        return imgArray != 0
+
+    return np.asarray(imgArray, dtype=dataTypes[dataKey])
+
+def RunStep(stepFunctionKey:str, imgArray:np.ndarray, parameters:dict, precision:str=fullPrecision) -> np.ndarray:
+    #steps that don't declare their data types get the image as it is
+    inputDataKey, outputDataKey = stepDataTypes.get(stepFunctionKey, (None, None))
+
+    imgArray = ToDataType(imgArray, inputDataKey, precision)
+    imgArray = stepFunctionMap[stepFunctionKey](imgArray, parameters)
+
+    return ToDataType(imgArray, outputDataKey, precision)
\ No newline at end of file
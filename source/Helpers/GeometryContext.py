@@ -0,0 +1,138 @@
+import numpy as np
+import cv2
+import threading
+
+from scipy.ndimage import distance_transform_edt
+
+from source.Helpers.SkeletonGraph import SkeletonGraph
+
+def CachedGeometry(function):
+    #read-only property computed once through GetOrCompute, so stats on different threads share one computation
+    #stored under its own key so it can't collide with a stat or intermediate value of the same name
+    key = "geometry." + function.__name__
+    return property(lambda context: context.GetOrCompute(key, function), doc=function.__doc__)
+
+class GeometryContext:
+    """
+    Geometry of one vectorized skeleton, shared by all of its stat functions.
+
+    Every value is computed the first time it is accessed and then reused, so stats that
+    need the same thing (segment lengths, the line->cluster map, the distance transform...)
+    only compute it once per skeleton, even when they run at the same time. Other shared intermediate results can be stored
+    with GetOrCompute. reducedPrecision stores the distance transform as float32.
+    """
+
+    def __init__(self, skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]], reducedPrecision:bool=False) -> None:
+        self.skeleton = skeleton
+        self.imgBeforeSkeleton = imgBeforeSkeleton
+        self.reducedPrecision = reducedPrecision
+
+        self.lines = lines
+        self.points = points
+        self.clusters = clusters
+
+        self.computedValues = {}
+
+        #one lock per key so stats running on different threads compute each value once
+        self.keyLocks = {}
+        self.keyLocksLock = threading.Lock()
+
+    def GetOrCompute(self, key:str, function):
+        #function takes this context and is only called the first time key is requested
+        if key in self.computedValues:
+            return self.computedValues[key]
+
+        with self.keyLocksLock:
+            keyLock = self.keyLocks.setdefault(key, threading.Lock())
+
+        with keyLock:
+            if key not in self.computedValues:
+                self.computedValues[key] = function(self)
+
+        return self.computedValues[key]
+
+    def SetValue(self, key:str, value) -> None:
+        self.computedValues[key] = value
+
+    def GetValue(self, key:str):
+        return self.computedValues[key]
+
+    @CachedGeometry
+    def graph(self) -> SkeletonGraph:
+        return SkeletonGraph.FromLists(self.lines, self.points, self.clusters)
+
+    @CachedGeometry
+    def pointArray(self) -> np.ndarray:
+        #full precision N x 2 points, the graph stores float32
+        return np.asarray(self.points, dtype=np.float64).reshape(-1, 2)
+
+    @CachedGeometry
+    def segments(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        #start point indices, end point indices and line index of every segment
+        return self.graph.Segments()
+
+    @CachedGeometry
+    def segmentVectors(self) -> np.ndarray:
+        startIndices, endIndices, _ = self.segments
+        return self.pointArray[endIndices] - self.pointArray[startIndices]
+
+    @CachedGeometry
+    def segmentLengths(self) -> np.ndarray:
+        return np.sqrt(np.einsum("ij,ij->i", self.segmentVectors, self.segmentVectors))
+
+    @CachedGeometry
+    def lineLengths(self) -> np.ndarray:
+        _, _, segmentLines = self.segments
+        return np.bincount(segmentLines, weights=self.segmentLengths, minlength=self.graph.NumLines())
+
+    @CachedGeometry
+    def clusterLengths(self) -> np.ndarray:
+        clusterIndices = self.graph.clusterIndices
+        return np.bincount(self.lineClusters[clusterIndices], weights=self.lineLengths[clusterIndices], minlength=self.graph.NumClusters())
+
+    @CachedGeometry
+    def lineClusters(self) -> np.ndarray:
+        return self.graph.lineClusters
+
+    @CachedGeometry
+    def lineBoundingBoxes(self) -> np.ndarray:
+        #(min x, min y, max x, max y) of every line, NaN for empty lines
+        boxes = np.full((self.graph.NumLines(), 4), np.nan)
+
+        nonEmptyLines = np.flatnonzero(self.graph.LineSizes() > 0)
+        if len(nonEmptyLines) == 0:
+            return boxes
+
+        linePoints = self.pointArray[self.graph.lineIndices]
+        lineStarts = self.graph.lineOffsets[nonEmptyLines]
+
+        boxes[nonEmptyLines, 0:2] = np.minimum.reduceat(linePoints, lineStarts, axis=0)
+        boxes[nonEmptyLines, 2:4] = np.maximum.reduceat(linePoints, lineStarts, axis=0)
+
+        return boxes
+
+    @CachedGeometry
+    def clusterBoundingBoxes(self) -> np.ndarray:
+        #(min x, min y, max x, max y) of every cluster, NaN for clusters without points
+        boxes = np.full((self.graph.NumClusters(), 4), np.nan)
+
+        nonEmptyClusters = np.flatnonzero(self.graph.ClusterSizes() > 0)
+        if len(nonEmptyClusters) == 0:
+            return boxes
+
+        clusterLineBoxes = self.lineBoundingBoxes[self.graph.clusterIndices]
+        clusterStarts = self.graph.clusterOffsets[nonEmptyClusters]
+
+        boxes[nonEmptyClusters, 0:2] = np.fmin.reduceat(clusterLineBoxes[:, 0:2], clusterStarts, axis=0)
+        boxes[nonEmptyClusters, 2:4] = np.fmax.reduceat(clusterLineBoxes[:, 2:4], clusterStarts, axis=0)
+
+        return boxes
+
+    @CachedGeometry
+    def distanceTransform(self) -> np.ndarray:
+        #distance from every white pixel of the thresholded image to the closest black pixel
+        if self.reducedPrecision:
+            #exact euclidean distances like scipy's, but float32 and without scipy's full size index arrays
+            return cv2.distanceTransform(np.asarray(self.imgBeforeSkeleton > 0.5, dtype=np.uint8), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+
+        return distance_transform_edt(self.imgBeforeSkeleton > 0.5)
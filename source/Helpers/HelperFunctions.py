@@ -1,5 +1,5 @@
 from PySide6.QtGui import QPixmap, QPen, QPainter, QColor, QImage
-from PySide6.QtCore import QPoint
+from PySide6.QtCore import QLine
 
 import re
 import random
@@ -7,9 +7,13 @@ import numpy as np
 import cv2
 from scipy.stats import linregress
 import math
-from collections import deque
+from scipy.ndimage import distance_transform_edt
+from scipy.spatial import cKDTree
 from PIL import Image
 
+from source.Helpers.SkeletonGraph import SkeletonGraph, ListsToCSR, SegmentsFromCSR
+from source.Helpers.GeometryContext import GeometryContext
+
 skeletonKey = "skeleton"
 originalImageKey = "originalImage"
 vectorKey = "vectorized"
@@ -23,9 +27,23 @@ imageTypeKey = "image"
 clusterTypeKey = "cluster"
 lineTypeKey = "line"
 
+#stats that take a GeometryContext instead of (skeleton, imgBeforeSkeleton, lines, points, clusters)
+#the context's graph holds the lines and clusters as arrays and its intermediates (segments, line
+#lengths, the distance transform...) are shared by every stat of the skeleton
+usesContextKey = "usesContext"
+
+#what each stat needs: any of the inputs below, or the keys of other stats and intermediate values
+inputsKey = "inputs"
+skeletonInputKey = "skeletonRaster"
+imageInputKey = "imageBeforeSkeleton"
+geometryInputKey = "geometry"
+
 timestampKey = "timestamp"
 sampleKey = "sample"
 
+#identifies what a pipeline's saved results were created from
+fingerprintKey = "fingerprint"
+
 def randomNumPerImage(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]]) -> float:
     return random.uniform(0, 1)
 
@@ -45,33 +63,44 @@ def randomNumPerLine(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:li
 
     return result
 
+def BoxMassPyramid(array:np.ndarray, numScales:int=None) -> list[np.ndarray]:
+    """
+    Number of white pixels in every box for box sizes 1, 2, 4, ... 2^(numScales - 1).
+
+    Level k is a grid with one entry per complete 2^k x 2^k box, boxes that would run
+    past the edge of the image are left out. Each level is made by summing 2x2 blocks of
+    the previous one, so the image is only read once.
+    """
+    if numScales is None:
+        numScales = int(np.log2(min(array.shape)))
+
+    pyramid = []
+    mass = np.asarray(array, dtype=bool).astype(np.int64)
+
+    for _ in range(numScales):
+        pyramid.append(mass)
+
+        height = (mass.shape[0] // 2) * 2
+        width = (mass.shape[1] // 2) * 2
+        mass = mass[:height, :width].reshape(height // 2, 2, width // 2, 2).sum(axis=(1, 3))
+
+    return pyramid
+
+def BoxCounts(pyramid:list[np.ndarray]) -> np.ndarray:
+    #number of boxes containing at least one white pixel at each scale
+    return np.array([np.count_nonzero(mass) for mass in pyramid], dtype=np.int64)
+
 #fractal dimension
 def fractalDimension(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]]) -> float:
-    # Ensure the array is binary
-    array = np.array(skeleton, dtype=bool)
+    # Box sizes (powers of 2)
+    pyramid = BoxMassPyramid(skeleton)
+    box_sizes = 2 ** np.arange(len(pyramid))
 
-    # Get the array dimensions
-    min_dim = min(array.shape)
+    # Count the number of boxes that contain at least one "1"
+    box_counts = BoxCounts(pyramid)
 
-    # Box sizes (powers of 2)
-    box_sizes = 2 ** np.arange(int(np.log2(min_dim)))
-
-    box_counts = []
-    for box_size in box_sizes:
-        # Count the number of boxes that contain at least one "1"
-        box_count = 0
-        for i in range(0, array.shape[0] - box_size + 1, box_size):
-            for j in range(0, array.shape[1] - box_size + 1, box_size):
-                if np.any(array[i:i+box_size, j:j+box_size]):
-                    box_count += 1
-        box_counts.append(box_count)
-        
-        if box_count == 0:
-            return 0.0
-
-    # Convert to numpy arrays
-    box_sizes = np.array(box_sizes)
-    box_counts = np.array(box_counts)
+    if np.any(box_counts == 0):
+        return 0.0
 
     # Use linear regression to fit a line to log(box_counts) vs log(1/box_size)
     slope, _, _, _, _ = linregress(np.log(1/box_sizes), np.log(box_counts))
@@ -88,179 +117,195 @@ def numClumpsInImage(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:li
     return len(clusters)
 
 #number of lines in each cluster
-def numLinesInClump(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]]) -> list[int]:
-    result = [len(cluster) for cluster in clusters]
-    return result
+def numLinesInClump(context:GeometryContext) -> list[int]:
+    return context.graph.ClusterSizes().tolist()
 
 #average length of lines in cluster
-def averageLengthOfLinesInClump(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]]) -> list[float]:
-    result = []
+def averageLengthOfLinesInClump(context:GeometryContext) -> list[float]:
+    graph = context.graph
+    clusterSizes = graph.ClusterSizes()
+    clusterLengths = np.zeros(len(clusterSizes))
 
-    for currentLines in clusters:
-        totalLength = 0.0
+    nonEmptyClusters = np.flatnonzero(clusterSizes > 0)
+    if len(nonEmptyClusters) > 0:
+        clusterLengths[nonEmptyClusters] = np.add.reduceat(context.lineLengths[graph.clusterIndices], graph.clusterOffsets[nonEmptyClusters])
 
-        for lineIndex in currentLines:
-            currentLine = lines[lineIndex]
+    return (clusterLengths / np.maximum(clusterSizes, 1)).tolist()
 
-            for i in range(len(currentLine) - 1):
-                point1 = points[currentLine[i]]
-                point2 = points[currentLine[i + 1]]
+def DistanceToWidth(distances:np.ndarray, height:int) -> np.ndarray:
+    #a structure n pixels across has a distance of about (n + 1) / 2 at its center, widths are normalized by image height
+    return np.maximum(2 * distances - 1, 0) / height
 
-                segmentLength = math.sqrt(pow(point2[0] - point1[0], 2) + pow(point2[1] - point1[1], 2))
+def NormalizedToPixels(points:np.ndarray, width:int, height:int) -> tuple[np.ndarray, np.ndarray]:
+    #round rather than truncate, normalizing and flipping y can leave coordinates just under a whole pixel
+    columns = np.clip(np.rint(points[:, 0] * width).astype(np.int64), 0, width - 1)
+    rows = np.clip(np.rint((1 - points[:, 1]) * height).astype(np.int64), 0, height - 1)
 
-                totalLength += segmentLength
+    return rows, columns
 
-        averageLength = totalLength / len(currentLines)
+def middleWidth(context:GeometryContext) -> list[float]:
+    #distance from every white pixel to the closest black pixel, shared with the other width stats
+    distances = context.distanceTransform
+    height, width = distances.shape
 
-        result.append(averageLength)
+    graph = context.graph
+    numLines = graph.NumLines()
+    if numLines == 0:
+        return []
 
-    return result
+    result = np.zeros(numLines)
 
-def draw_line(startPosition:tuple[float, float], direction:tuple[float, float], dimension:tuple[int, int]) -> np.ndarray:
-    result = np.zeros(dimension)
+    startIndices, endIndices, segmentLines = context.segments
+    if len(startIndices) == 0:
+        return result.tolist()
 
-    cols, rows = dimension
-    x0 = int(cols * startPosition[0])
-    y0 = int(rows * startPosition[1])
-    dx, dy = direction
+    #pixel coordinates (column, row) of every point
+    pointArray = context.pointArray
+    pixelPoints = np.stack([pointArray[:, 0] * width, (1 - pointArray[:, 1]) * height], axis=1)
 
-    norm = (dx**2 + dy**2)**0.5
-    if norm == 0:
-        return result  # No direction
-    dx /= norm
-    dy /= norm
+    segmentStarts = pixelPoints[startIndices]
+    segmentDeltas = pixelPoints[endIndices] - segmentStarts
+    segmentLengths = np.linalg.norm(segmentDeltas, axis=1)
 
-    def draw_one_direction(x, y, dx, dy):
-        while 0 <= int(round(y)) < rows and 0 <= int(round(x)) < cols:
-            result[int(round(y)), int(round(x))] = 1
-            x += dx
-            y += dy
+    #segments are grouped by line, so each line's arc length is a slice of one running total
+    cumulativeLengths = np.cumsum(segmentLengths)
+    linesWithSegments = np.unique(segmentLines)
+    firstSegments = np.searchsorted(segmentLines, linesWithSegments, side="left")
+    lastSegments = np.searchsorted(segmentLines, linesWithSegments, side="right") - 1
 
-    # Draw in both directions
-    draw_one_direction(x0, y0, dx, dy)       # Forward
-    draw_one_direction(x0, y0, -dx, -dy)     # Backward
+    lineStartLengths = cumulativeLengths[firstSegments] - segmentLengths[firstSegments]
+    lineLengths = cumulativeLengths[lastSegments] - lineStartLengths
 
-    return result
+    #the segment holding each line's arc length midpoint, and how far along it the midpoint is
+    targetLengths = lineStartLengths + lineLengths / 2
+    midSegments = np.clip(np.searchsorted(cumulativeLengths, targetLengths, side="left"), firstSegments, lastSegments)
 
-def bfs_count_connected_pixels(grid: np.ndarray, start_row: int, start_col: int) -> int:
-    if grid[start_row, start_col] != 1.0:
-        return 0
-
-    rows, cols = grid.shape
-    visited = np.zeros_like(grid, dtype=bool)
-    queue = deque()
-    queue.append((start_row, start_col))
-    visited[start_row, start_col] = True
-    count = 1
-
-    # Define 8 directions (including diagonals)
-    directions = [(-1, -1), (-1, 0), (-1, 1),
-                  ( 0, -1),          ( 0, 1),
-                  ( 1, -1), ( 1, 0), ( 1, 1)]
-
-    while queue:
-        r, c = queue.popleft()
-        for dr, dc in directions:
-            nr, nc = r + dr, c + dc
-            if (0 <= nr < rows and 0 <= nc < cols and
-                not visited[nr, nc] and grid[nr, nc] == 1.0):
-                visited[nr, nc] = True
-                queue.append((nr, nc))
-                count += 1
-
-    return count
-
-def getLineWidth(thresholdedImage:np.ndarray, direction:tuple[float, float], startingPoint:tuple[float, float]) -> float:
-    #draw line along direction
-    lineDrawn = draw_line(startingPoint, direction, thresholdedImage.shape)
-
-    #AND thresholded image and the line
-    andImage = np.logical_and(thresholdedImage > 0.5, lineDrawn > 0.5).astype(np.float64)
-
-    #BFS to get the number of white pixels connected to starting point
-    width = bfs_count_connected_pixels(andImage, int(startingPoint[1] * thresholdedImage.shape[1]), int(startingPoint[0] * thresholdedImage.shape[0]))
-    
-    width /= thresholdedImage.shape[0]
+    midSegmentLengths = segmentLengths[midSegments]
+    fractions = np.divide(targetLengths - (cumulativeLengths[midSegments] - midSegmentLengths), midSegmentLengths,
+                          out=np.zeros(len(midSegments)), where=midSegmentLengths > 0)
+    midPoints = segmentStarts[midSegments] + np.clip(fractions, 0, 1)[:, None] * segmentDeltas[midSegments]
 
-    return width
+    columns = np.clip(np.rint(midPoints[:, 0]).astype(np.int64), 0, width - 1)
+    rows = np.clip(np.rint(midPoints[:, 1]).astype(np.int64), 0, height - 1)
+    result[linesWithSegments] = DistanceToWidth(distances[rows, columns], height)
+
+    return result.tolist()
+
+def LineWidthProfiles(context:GeometryContext) -> dict:
+    """
+    Mean, min, max and standard deviation of the width along every line.
+
+    The skeleton's distance transform is sampled at every pixel along every line in a
+    single gather and reduced per line with reduceat.
+    """
+    distances = context.distanceTransform
+    height, width = distances.shape
+
+    graph = context.graph
+    pointArray = context.pointArray
+
+    #pixel coordinates (column, row) of every point
+    pixelPoints = np.stack([pointArray[:, 0] * width, (1 - pointArray[:, 1]) * height], axis=1)
+
+    #step along every segment one pixel at a time, leaving out the segment's last point
+    startIndices, endIndices, segmentLines = context.segments
+    segmentStarts = pixelPoints[startIndices]
+    segmentDeltas = pixelPoints[endIndices] - segmentStarts
+    numSteps = np.maximum(np.ceil(np.abs(segmentDeltas).max(axis=1, initial=0)).astype(np.int64), 1)
+
+    sampleSegments = np.repeat(np.arange(len(startIndices)), numSteps)
+    stepOffsets = np.concatenate([[0], np.cumsum(numSteps)[:-1]])
+    fractions = (np.arange(len(sampleSegments)) - stepOffsets[sampleSegments]) / numSteps[sampleSegments]
+    samplePoints = segmentStarts[sampleSegments] + fractions[:, None] * segmentDeltas[sampleSegments]
+
+    #add the last point of every line
+    lineSizes = graph.LineSizes()
+    nonEmptyLines = np.flatnonzero(lineSizes > 0)
+    lastPoints = pixelPoints[graph.lineIndices[graph.lineOffsets[nonEmptyLines + 1] - 1]]
+
+    samplePoints = np.concatenate([samplePoints, lastPoints])
+    sampleLines = np.concatenate([segmentLines[sampleSegments], nonEmptyLines])
+
+    #sample widths, grouped by line
+    order = np.argsort(sampleLines, kind="stable")
+    samplePoints = samplePoints[order]
+
+    columns = np.clip(np.rint(samplePoints[:, 0]).astype(np.int64), 0, width - 1)
+    rows = np.clip(np.rint(samplePoints[:, 1]).astype(np.int64), 0, height - 1)
+    widths = DistanceToWidth(distances[rows, columns], height)
+
+    sampleCounts = np.bincount(sampleLines, minlength=graph.NumLines())
+    sampleOffsets = np.concatenate([[0], np.cumsum(sampleCounts)[:-1]])[nonEmptyLines]
+
+    result = {
+        "mean": np.zeros(graph.NumLines()),
+        "min": np.zeros(graph.NumLines()),
+        "max": np.zeros(graph.NumLines()),
+        "std": np.zeros(graph.NumLines())
+    }
+
+    if len(nonEmptyLines) > 0:
+        counts = sampleCounts[nonEmptyLines]
+        means = np.add.reduceat(widths, sampleOffsets) / counts
+        meanSquares = np.add.reduceat(widths * widths, sampleOffsets) / counts
+
+        result["mean"][nonEmptyLines] = means
+        result["min"][nonEmptyLines] = np.minimum.reduceat(widths, sampleOffsets)
+        result["max"][nonEmptyLines] = np.maximum.reduceat(widths, sampleOffsets)
+        result["std"][nonEmptyLines] = np.sqrt(np.maximum(meanSquares - means * means, 0))
 
-def middleWidth(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]]) -> list[float]:
-    result = []
-    
-    #loop through each line
-    for line in lines:
-        if len(line) < 2:
-            result.append(0.0)
-
-        #get center point of line
-        numPointsInLine = len(line)
-        centerPointIndex = line[numPointsInLine // 2]
-        centerPoint = points[centerPointIndex]
-        centerPoint = (centerPoint[0], 1 - centerPoint[1])
-
-        lastPointIndex = line[(numPointsInLine // 2) - 1]
-        lastPoint = points[lastPointIndex]
-        lastPoint = (lastPoint[0], 1 - lastPoint[1])
-
-        #get direction of line
-        direction = (centerPoint[0] - lastPoint[0], centerPoint[1] - lastPoint[1])
-        magnitude = math.sqrt(math.pow(direction[0], 2) + math.pow(direction[1], 2))
-        direction = (direction[0] / magnitude, direction[1] / magnitude)
-
-        #get orthogonal direction to line
-        orthogonalDirection = (direction[1], -direction[0])
-
-        #width function
-        currentWidth = getLineWidth(imgBeforeSkeleton, orthogonalDirection, centerPoint)
-
-        #add to result
-        result.append(currentWidth)
-    
     return result
 
+def meanLineWidth(context:GeometryContext) -> list[float]:
+    return context.GetOrCompute("lineWidthProfiles", LineWidthProfiles)["mean"].tolist()
+
+def minLineWidth(context:GeometryContext) -> list[float]:
+    return context.GetOrCompute("lineWidthProfiles", LineWidthProfiles)["min"].tolist()
+
+def maxLineWidth(context:GeometryContext) -> list[float]:
+    return context.GetOrCompute("lineWidthProfiles", LineWidthProfiles)["max"].tolist()
+
+def lineWidthStandardDeviation(context:GeometryContext) -> list[float]:
+    return context.GetOrCompute("lineWidthProfiles", LineWidthProfiles)["std"].tolist()
+
 #whether each line is straight
-def isLineStraight(skeleton:np.ndarray, imgBeforeSkeleton:np.ndarray, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]]) -> list[bool]:
+def isLineStraight(context:GeometryContext) -> list[bool]:
     requirementForStraight = 0.95
-    
-    result = []
 
-    for line in lines:
-        numPointsInLine = len(line)
-        
-        if numPointsInLine <= 2:
-            result.append(True)
-            continue
+    points = context.pointArray
+    lineOffsets = context.graph.lineOffsets
+    lineIndices = context.graph.lineIndices
 
-        startPoint = points[line[0]]
-        endPoint = points[line[-1]]
-        midPoint = points[line[numPointsInLine // 2]]
+    lineSizes = context.graph.LineSizes()
+    result = np.ones(len(lineSizes), dtype=bool)
 
-        startToEnd = (endPoint[0] - startPoint[0], endPoint[1] - startPoint[1])
-        startToEndLength = math.sqrt(pow(startToEnd[0], 2) + pow(startToEnd[1], 2))
+    #lines with 2 or fewer points are always straight
+    longLines = np.flatnonzero(lineSizes > 2)
+    if len(longLines) == 0:
+        return result.tolist()
 
-        if startToEndLength < 0.01:
-            result.append(True)
-            continue
+    lineStarts = lineOffsets[longLines]
+    startPoints = points[lineIndices[lineStarts]]
+    endPoints = points[lineIndices[lineOffsets[longLines + 1] - 1]]
+    midPoints = points[lineIndices[lineStarts + (lineSizes[longLines] // 2)]]
 
-        startToEnd = (startToEnd[0] / startToEndLength, startToEnd[1] / startToEndLength)
+    startToEnd = endPoints - startPoints
+    startToEndLengths = np.sqrt(startToEnd[:, 0] ** 2 + startToEnd[:, 1] ** 2)
 
-        startToMid = (midPoint[0] - startPoint[0], midPoint[1] - startPoint[1])
-        startToMidLength = math.sqrt(pow(startToMid[0], 2) + pow(startToMid[1], 2))
+    startToMid = midPoints - startPoints
+    startToMidLengths = np.sqrt(startToMid[:, 0] ** 2 + startToMid[:, 1] ** 2)
 
-        if startToMidLength < 0.01:
-            result.append(True)
-            continue
+    #lines whose start, middle or end points are (nearly) on top of each other count as straight
+    measurable = (startToEndLengths >= 0.01) & (startToMidLengths >= 0.01)
 
-        startToMid = (startToMid[0] / startToMidLength, startToMid[1] / startToMidLength)
+    startToEnd = startToEnd / np.where(measurable, startToEndLengths, 1.0)[:, None]
+    startToMid = startToMid / np.where(measurable, startToMidLengths, 1.0)[:, None]
 
-        similarity = abs((startToEnd[0] * startToMid[0]) + (startToEnd[1] * startToMid[1]))
+    similarity = np.abs((startToEnd[:, 0] * startToMid[:, 0]) + (startToEnd[:, 1] * startToMid[:, 1]))
 
-        if similarity > requirementForStraight:
-            result.append(True)
-        else:
-            result.append(False)
+    result[longLines] = ~measurable | (similarity > requirementForStraight)
 
-    return result
+    return result.tolist()
 
 def camel_case_to_capitalized(text):
     """
@@ -275,36 +320,42 @@ def camel_case_to_capitalized(text):
     return re.sub(r"([A-Z])", r" \1", text).title()
 
 def draw_lines_on_pixmap(points:list[tuple[float, float]], lines:list[list[int]], 
-                         dimension:int=249, colorMap:dict={}, line_color=QColor("white"), line_width=2, pixmap:QPixmap=None):
+                         dimension:int=249, colorMap:dict={}, line_color=QColor("white"), line_width=2, pixmap:QPixmap=None,
+                         graph:SkeletonGraph=None):
     if pixmap is None:
         pixmap = QPixmap(dimension, dimension)
         pixmap.fill(QColor("black"))
 
+    if graph is None:
+        graph = SkeletonGraph.FromLists(lines, [], [])
+        normalizedPoints = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    else:
+        normalizedPoints = graph.points
+
+    # Scale all normalized points to pixel coordinates at once
+    xs = (normalizedPoints[:, 0] * dimension).astype(np.int64)
+    ys = ((1 - normalizedPoints[:, 1]) * dimension).astype(np.int64)
+
+    startIndices, endIndices, segmentLines = graph.Segments()
+
     painter = QPainter(pixmap)
     pen = QPen(line_color)
     pen.setWidth(line_width)
-    painter.setPen(pen)
-
-    # Helper to scale normalized points to pixel coordinates
-    def scale_point(p):
-        x = int(p[0] * dimension)
-        y = int((1 - p[1]) * dimension)
-        return QPoint(x, y)
-
-    for lineIndex, line in enumerate(lines):
-        if lineIndex in colorMap:
-            pen.setColor(colorMap[lineIndex])
-            painter.setPen(pen)
-        else:
-            pen.setColor(line_color)
-            painter.setPen(pen)
-
-        if len(line) < 2:
-            continue
-        for i in range(len(line) - 1):
-            p1 = scale_point(points[line[i]])
-            p2 = scale_point(points[line[i + 1]])
-            painter.drawLine(p1, p2)
+
+    def draw_segments(segmentMask, color):
+        pen.setColor(color)
+        painter.setPen(pen)
+
+        pixelLines = [QLine(x1, y1, x2, y2) for x1, y1, x2, y2 in zip(xs[startIndices[segmentMask]].tolist(), ys[startIndices[segmentMask]].tolist(),
+                                                                       xs[endIndices[segmentMask]].tolist(), ys[endIndices[segmentMask]].tolist())]
+        painter.drawLines(pixelLines)
+
+    # Lines without a custom color are drawn together, highlighted lines are drawn on top
+    isDefaultColor = np.logical_not(np.isin(segmentLines, list(colorMap.keys())))
+    draw_segments(isDefaultColor, line_color)
+
+    for lineIndex, color in colorMap.items():
+        draw_segments(segmentLines == lineIndex, color)
 
     painter.end()
     return pixmap
@@ -416,76 +467,243 @@ def DistanceToLine(P, A, B):
     # Return distance from P to the closest point
     return np.linalg.norm(P - closest_point)
 
+#bump when a stat's calculation changes so saved results are recomputed
+statFunctionMapVersion = 2
+
 #calculates metadata about each skeleton
 statFunctionMap = {
     "fractalDimension": {
         functionKey: fractalDimension,
         functionTypeKey: imageTypeKey,
-        "inImageSpace": False
+        "inImageSpace": False,
+        inputsKey: [skeletonInputKey]
     },
     "linesInImage": {
         functionKey: numLinesInImage,
         functionTypeKey: imageTypeKey,
-        "inImageSpace": False
+        "inImageSpace": False,
+        inputsKey: [geometryInputKey]
     },
     "clustersInImage": {
         functionKey: numClumpsInImage,
         functionTypeKey: imageTypeKey,
-        "inImageSpace": False
+        "inImageSpace": False,
+        inputsKey: [geometryInputKey]
     },
     "linesInCluster": {
         functionKey: numLinesInClump,
         functionTypeKey: clusterTypeKey,
-        "inImageSpace": False
+        "inImageSpace": False,
+        usesContextKey: True,
+        inputsKey: [geometryInputKey]
     },
     "averageLineLength": {
         functionKey: averageLengthOfLinesInClump,
         functionTypeKey: clusterTypeKey,
-        "inImageSpace": True
+        "inImageSpace": True,
+        usesContextKey: True,
+        inputsKey: [geometryInputKey]
     },
     "isLineStraight": {
         functionKey: isLineStraight,
         functionTypeKey: lineTypeKey,
-        "inImageSpace": False
+        "inImageSpace": False,
+        usesContextKey: True,
+        inputsKey: [geometryInputKey]
     },
     "centerLineWidth": {
         functionKey:middleWidth,
         functionTypeKey: lineTypeKey,
-        "inImageSpace": True
+        "inImageSpace": True,
+        usesContextKey: True,
+        inputsKey: [geometryInputKey, "distanceTransform"]
+    },
+    "meanLineWidth": {
+        functionKey: meanLineWidth,
+        functionTypeKey: lineTypeKey,
+        "inImageSpace": True,
+        usesContextKey: True,
+        inputsKey: ["lineWidthProfiles"]
+    },
+    "minLineWidth": {
+        functionKey: minLineWidth,
+        functionTypeKey: lineTypeKey,
+        "inImageSpace": True,
+        usesContextKey: True,
+        inputsKey: ["lineWidthProfiles"]
+    },
+    "maxLineWidth": {
+        functionKey: maxLineWidth,
+        functionTypeKey: lineTypeKey,
+        "inImageSpace": True,
+        usesContextKey: True,
+        inputsKey: ["lineWidthProfiles"]
+    },
+    "lineWidthStandardDeviation": {
+        functionKey: lineWidthStandardDeviation,
+        functionTypeKey: lineTypeKey,
+        "inImageSpace": True,
+        usesContextKey: True,
+        inputsKey: ["lineWidthProfiles"]
+    }
+}
+
+def DistanceTransform(context:GeometryContext) -> np.ndarray:
+    return context.distanceTransform
+
+#values shared by several stats, computed once per skeleton but not saved in the results
+intermediateFunctionMap = {
+    "distanceTransform": {
+        functionKey: DistanceTransform,
+        inputsKey: [imageInputKey]
+    },
+    "lineWidthProfiles": {
+        functionKey: LineWidthProfiles,
+        inputsKey: [geometryInputKey, "distanceTransform"]
     }
 }
 
+def CallStatFunction(statKey:str, context:GeometryContext):
+    if statKey in intermediateFunctionMap:
+        return context.GetOrCompute(statKey, intermediateFunctionMap[statKey][functionKey])
+
+    statFunction = statFunctionMap[statKey][functionKey]
+
+    if statFunctionMap[statKey].get(usesContextKey, False):
+        return statFunction(context)
+
+    #stats written against the original signature get the raw skeleton, image and vectors
+    return statFunction(context.skeleton, context.imgBeforeSkeleton, context.lines, context.points, context.clusters)
+
 def TupleDistance(point1:tuple[float, float], point2:tuple[float, float]) -> float:
     return math.sqrt(math.pow(point2[0] - point1[0], 2) + math.pow(point2[1] - point1[1], 2))
 
-def AvgDistanceToClosestPoint(skeleton1:tuple[list[list[int]], list[tuple[float, float]]], skeleton2:tuple[list[list[int]], list[tuple[float, float]]]) -> float:
-    totalDistance = 0.0
-    
-    for point1 in skeleton1[1]:
-        minDistance = float("inf")
+#spacing between samples when comparing densified skeletons, in normalized coordinates
+densifySpacing = 0.002
 
-        for point2 in skeleton2[1]:
-            minDistance = min(minDistance, TupleDistance(point1, point2))
+def SkeletonSamplePoints(skeleton:tuple[list[list[int]], list[tuple[float, float]]], densify:bool=False) -> np.ndarray:
+    #N x 2 array of the skeleton's points, plus evenly spaced points along every segment if densify is set
+    lines, points = skeleton
+    pointArray = np.asarray(points, dtype=np.float64).reshape(-1, 2)
 
-        totalDistance += minDistance
+    if not densify or len(lines) == 0:
+        return pointArray
 
-    return totalDistance / len(skeleton1[1])
+    lineOffsets, lineIndices = ListsToCSR(lines)
+    startIndices, endIndices, _ = SegmentsFromCSR(lineOffsets, lineIndices)
 
-def MaxDistanceToClosestPoint(skeleton1:tuple[list[list[int]], list[tuple[float, float]]], skeleton2:tuple[list[list[int]], list[tuple[float, float]]]) -> float:
-    maxDistance = 0.0
-    
-    for point1 in skeleton1[1]:
-        minDistance = float("inf")
+    segmentStarts = pointArray[startIndices]
+    segmentVectors = pointArray[endIndices] - segmentStarts
+    segmentLengths = np.linalg.norm(segmentVectors, axis=1)
+
+    #samples k / n along each segment for k in 1..n-1, the end points are already in pointArray
+    numSteps = np.maximum(np.ceil(segmentLengths / densifySpacing).astype(np.int64), 1)
+    numSamples = numSteps - 1
+    sampleSegments = np.repeat(np.arange(len(numSamples)), numSamples)
+
+    firstSamples = np.cumsum(numSamples) - numSamples
+    sampleSteps = np.arange(len(sampleSegments)) - firstSamples[sampleSegments] + 1
+    sampleFractions = sampleSteps / numSteps[sampleSegments]
+
+    samples = segmentStarts[sampleSegments] + sampleFractions[:, None] * segmentVectors[sampleSegments]
+
+    return np.concatenate([pointArray, samples])
+
+def ClosestPointDistances(skeleton1:tuple[list[list[int]], list[tuple[float, float]]], skeleton2:tuple[list[list[int]], list[tuple[float, float]]], densify:bool=False) -> np.ndarray:
+    #distance from every point of skeleton1 to the closest point of skeleton2
+    points1 = SkeletonSamplePoints(skeleton1, densify)
+    points2 = SkeletonSamplePoints(skeleton2, densify)
+
+    if len(points2) == 0:
+        return np.full(len(points1), np.inf)
 
-        for point2 in skeleton2[1]:
-            minDistance = min(minDistance, TupleDistance(point1, point2))
+    if len(points1) == 0:
+        return np.zeros(0)
 
-        maxDistance = max(maxDistance, minDistance)
+    distances, _ = cKDTree(points2).query(points1, k=1)
+    return distances
 
-    return maxDistance
+def AvgDistanceToClosestPoint(skeleton1:tuple[list[list[int]], list[tuple[float, float]]], skeleton2:tuple[list[list[int]], list[tuple[float, float]]], densify:bool=False) -> float:
+    distances = ClosestPointDistances(skeleton1, skeleton2, densify)
+
+    if len(distances) == 0:
+        return float("nan")
+
+    return float(np.mean(distances))
+
+def MaxDistanceToClosestPoint(skeleton1:tuple[list[list[int]], list[tuple[float, float]]], skeleton2:tuple[list[list[int]], list[tuple[float, float]]], densify:bool=False) -> float:
+    return float(np.max(ClosestPointDistances(skeleton1, skeleton2, densify), initial=0.0))
+
+#largest distance from a point on either skeleton to the other skeleton
+def HausdorffDistance(skeleton1:tuple[list[list[int]], list[tuple[float, float]]], skeleton2:tuple[list[list[int]], list[tuple[float, float]]], densify:bool=False) -> float:
+    return max(MaxDistanceToClosestPoint(skeleton1, skeleton2, densify), MaxDistanceToClosestPoint(skeleton2, skeleton1, densify))
+
+#average distance to the closest point, measured from the first skeleton to the second and the second to the first, summed
+def ChamferDistance(skeleton1:tuple[list[list[int]], list[tuple[float, float]]], skeleton2:tuple[list[list[int]], list[tuple[float, float]]], densify:bool=False) -> float:
+    return AvgDistanceToClosestPoint(skeleton1, skeleton2, densify) + AvgDistanceToClosestPoint(skeleton2, skeleton1, densify)
+
+def RasterizeSkeleton(lines:list[list[int]], points:list[tuple[float, float]], shape:tuple[int, int]) -> np.ndarray:
+    #draws vectorized lines into a boolean image with the given (height, width)
+    height, width = shape
+    raster = np.zeros((height, width), dtype=np.uint8)
+
+    pointArray = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    rows, columns = NormalizedToPixels(pointArray, width, height)
+    pixelPoints = np.stack([columns, rows], axis=1).astype(np.int32)
+
+    polylines = [pixelPoints[line] for line in lines if len(line) > 0]
+    if len(polylines) > 0:
+        cv2.polylines(raster, polylines, isClosed=False, color=1, thickness=1)
+
+    return raster > 0
+
+#distance in pixels within which a skeleton pixel counts as matched by the other skeleton
+rasterComparisonTolerance = 2.0
+
+def RasterComparisonScores(generatedSkeleton:np.ndarray, uploadedSkeleton:np.ndarray, tolerance:float=rasterComparisonTolerance) -> dict:
+    """
+    Precision, recall and F1 score of a generated skeleton against an uploaded one.
+
+    A generated pixel is correct if an uploaded pixel is within tolerance pixels of it
+    (precision), and an uploaded pixel is found if a generated pixel is within tolerance
+    of it (recall). Both come from one distance transform per skeleton.
+    """
+    generatedSkeleton = np.asarray(generatedSkeleton, dtype=bool)
+    uploadedSkeleton = np.asarray(uploadedSkeleton, dtype=bool)
+
+    if generatedSkeleton.shape != uploadedSkeleton.shape:
+        raise ValueError(f"Skeleton rasters have different shapes: {generatedSkeleton.shape} and {uploadedSkeleton.shape}")
+
+    #distance from every pixel to the closest skeleton pixel, OpenCV's precise mask gives exact euclidean distances
+    distanceToGenerated = cv2.distanceTransform(np.asarray(~generatedSkeleton, dtype=np.uint8), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    distanceToUploaded = cv2.distanceTransform(np.asarray(~uploadedSkeleton, dtype=np.uint8), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+
+    numGenerated = np.count_nonzero(generatedSkeleton)
+    numUploaded = np.count_nonzero(uploadedSkeleton)
+
+    matchedGenerated = np.count_nonzero(distanceToUploaded[generatedSkeleton] <= tolerance)
+    matchedUploaded = np.count_nonzero(distanceToGenerated[uploadedSkeleton] <= tolerance)
+
+    precision = matchedGenerated / numGenerated if numGenerated > 0 else 0.0
+    recall = matchedUploaded / numUploaded if numUploaded > 0 else 0.0
+    f1Score = (2 * precision * recall) / (precision + recall) if precision + recall > 0 else 0.0
+
+    return {
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1Score": float(f1Score)
+    }
+
+#keys of the scores returned by RasterComparisonScores
+rasterComparisonKeys = ["precision", "recall", "f1Score"]
 
 #compares generated skeletons to uploaded skeletons
 comparisonFunctionMap = {
     "averageDistanceToClosestPoint": AvgDistanceToClosestPoint,
-    "maxDistanceToClosestPoint": MaxDistanceToClosestPoint
-}
\ No newline at end of file
+    "maxDistanceToClosestPoint": MaxDistanceToClosestPoint,
+    "hausdorffDistance": HausdorffDistance,
+    "chamferDistance": ChamferDistance
+}
+
+#comparisons that take densify as a third argument, every other comparison is called with the two skeletons only
+densifyComparisonKeys = {"averageDistanceToClosestPoint", "maxDistanceToClosestPoint", "hausdorffDistance", "chamferDistance"}
@@ -0,0 +1,87 @@
+import numpy as np
+import os
+import threading
+
+from collections import OrderedDict
+from PIL import Image
+
+class ImageCache:
+    """
+    In-memory LRU cache of normalized input images.
+
+    Entries are keyed by the file's path, modification time and size, so an edited file is
+    decoded again. Cached arrays are shared between callers and are read-only, copy one
+    before modifying it. The least recently used arrays are dropped once the cache holds
+    more than maxBytes.
+    """
+
+    def __init__(self, maxBytes:int) -> None:
+        self.maxBytes = maxBytes
+
+        self.entries:OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self.totalBytes = 0
+
+        self.lock = threading.Lock()
+
+    def Get(self, filePath:str, grayscale:bool=False, dataType:type=np.float64) -> np.ndarray:
+        fileStats = os.stat(filePath)
+        path = os.path.abspath(filePath)
+        dataType = np.dtype(dataType)
+        key = (path, fileStats.st_mtime_ns, fileStats.st_size, grayscale, dataType)
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        imgArray = DecodeNormalizedImage(filePath, grayscale, dataType)
+        imgArray.flags.writeable = False
+
+        with self.lock:
+            #older versions of the same file can't be requested again
+            for staleKey in [entryKey for entryKey in self.entries if entryKey[0] == path and entryKey[3:] == key[3:]]:
+                self.totalBytes -= self.entries.pop(staleKey).nbytes
+
+            if imgArray.nbytes <= self.maxBytes:
+                self.entries[key] = imgArray
+                self.totalBytes += imgArray.nbytes
+
+            while self.totalBytes > self.maxBytes:
+                _, evictedArray = self.entries.popitem(last=False)
+                self.totalBytes -= evictedArray.nbytes
+
+        return imgArray
+
+    def SetMaxBytes(self, maxBytes:int) -> None:
+        with self.lock:
+            self.maxBytes = maxBytes
+
+            while self.totalBytes > self.maxBytes:
+                _, evictedArray = self.entries.popitem(last=False)
+                self.totalBytes -= evictedArray.nbytes
+
+    def Clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.totalBytes = 0
+
+def DecodeNormalizedImage(filePath:str, grayscale:bool=False, dataType:type=np.float64) -> np.ndarray:
+    #image scaled to [0, 1], grayscale averages the color channels of RGB images
+    imgArray = np.asarray(Image.open(filePath), dtype=dataType).copy()
+
+    maxValue = np.max(imgArray)
+    minValue = np.min(imgArray)
+    imgArray -= minValue
+    maxValue -= minValue
+    imgArray /= maxValue
+
+    if grayscale and imgArray.ndim > 2:
+        return imgArray.mean(axis=-1)
+
+    return imgArray
+
+#shared by every window and GenerateSkeleton
+imageCache = ImageCache(512 * 1024 * 1024)
+
+def LoadNormalizedImage(filePath:str, grayscale:bool=False, dataType:type=np.float64) -> np.ndarray:
+    return imageCache.Get(filePath, grayscale, dataType)
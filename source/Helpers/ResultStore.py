@@ -0,0 +1,331 @@
+import numpy as np
+import io
+import json
+import os
+import threading
+import zipfile
+
+from collections import OrderedDict
+
+from source.Helpers.HelperFunctions import vectorKey, pointsKey, linesKey, clusterKey
+from source.Helpers.SkeletonGraph import ListsToCSR, CSRToLists
+from source.Helpers.AtomicWrite import AtomicWritePath, WriteJSONAtomically
+
+calculationsStoreSuffix = "_calculations.npz"
+calculationsJSONSuffix = "_calculations.json"
+
+#bump when the layout of the arrays changes
+resultStoreVersion = 1
+
+#errors meaning a calculations file is missing, incomplete or not a calculations file
+calculationsReadErrors = (OSError, ValueError, KeyError, zipfile.BadZipFile)
+
+def IsPipelineResult(value) -> bool:
+    return isinstance(value, dict) and vectorKey in value
+
+def IsNumericList(value) -> bool:
+    if not isinstance(value, list):
+        return False
+
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        return False
+
+    return array.ndim == 1 and array.dtype.kind in "biuf"
+
+def IndexArray(indices:np.ndarray) -> np.ndarray:
+    return indices.astype(np.int32) if len(indices) == 0 or indices.max() < 2**31 else indices
+
+def SaveResultStore(calculations:dict, path:str, compress:bool=True) -> None:
+    """
+    Saves one image's calculations as a binary store, in place of the JSON file.
+
+    Each pipeline's points are a float64 array, so they load exactly as they were saved, its
+    lines and clusters are CSR offset and index arrays, and every per-line or per-cluster stat
+    is its own array. Everything else
+    (paths, scalar stats, comments, fingerprints) goes in a small JSON metadata record, so it
+    can be read without touching the arrays.
+    """
+
+    metadata = {"version": resultStoreVersion, "calculations": {}}
+    arrays = {}
+
+    for key, value in calculations.items():
+        if not IsPipelineResult(value):
+            metadata["calculations"][key] = value
+            continue
+
+        prefix = key + "/"
+
+        arrays[prefix + pointsKey] = np.asarray(value[vectorKey][pointsKey], dtype=np.float64).reshape(-1, 2)
+
+        lineOffsets, lineIndices = ListsToCSR(value[vectorKey][linesKey])
+        arrays[prefix + "lineOffsets"] = IndexArray(lineOffsets)
+        arrays[prefix + "lineIndices"] = IndexArray(lineIndices)
+
+        clusterOffsets, clusterIndices = ListsToCSR(value[vectorKey][clusterKey])
+        arrays[prefix + "clusterOffsets"] = IndexArray(clusterOffsets)
+        arrays[prefix + "clusterIndices"] = IndexArray(clusterIndices)
+
+        #keyOrder keeps the entry's keys in the order they were saved, arrays lists the stats stored as arrays
+        pipelineMetadata = {"keyOrder": list(value), "arrays": [], "values": {}}
+
+        for statKey, statValue in value.items():
+            if statKey == vectorKey:
+                continue
+
+            if IsNumericList(statValue):
+                arrays[prefix + "stats/" + statKey] = np.asarray(statValue)
+                pipelineMetadata["arrays"].append(statKey)
+            else:
+                pipelineMetadata["values"][statKey] = statValue
+
+        metadata["calculations"][key] = pipelineMetadata
+        metadata.setdefault("pipelines", []).append(key)
+
+    arrays["metadata"] = np.frombuffer(json.dumps(metadata).encode("utf-8"), dtype=np.uint8)
+
+    saveFunction = np.savez_compressed if compress else np.savez
+
+    with AtomicWritePath(path) as temporaryPath:
+        #a file object so numpy doesn't add its own extension
+        with open(temporaryPath, "wb") as storeFile:
+            saveFunction(storeFile, **arrays)
+
+class ResultStore:
+    """
+    Calculations saved by SaveResultStore, loaded lazily.
+
+    Opening the store only reads the metadata record, a pipeline's arrays are read the first
+    time that pipeline is loaded. Loaded results have the same layout as the JSON files. Close
+    the store (or use it in a with block) before the file is replaced, or open it with inMemory
+    to read the file up front and keep no file handle.
+    """
+
+    def __init__(self, path:str, inMemory:bool=False) -> None:
+        self.path = path
+
+        if inMemory:
+            with open(path, "rb") as storeFile:
+                self.archive = np.load(io.BytesIO(storeFile.read()), allow_pickle=False)
+        else:
+            self.archive = np.load(path, allow_pickle=False)
+
+        self.metadata = json.loads(self.archive["metadata"].tobytes().decode("utf-8"))
+
+        if self.metadata.get("version") != resultStoreVersion:
+            self.archive.close()
+            raise ValueError(f"{path} was saved with an unsupported result store version")
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exceptionInfo) -> None:
+        self.Close()
+
+    def Close(self) -> None:
+        self.archive.close()
+
+    def PipelineKeys(self) -> list[str]:
+        return list(self.metadata.get("pipelines", []))
+
+    def Metadata(self) -> dict:
+        #every pipeline entry only has its values that aren't arrays
+        metadata = {}
+
+        for key, value in self.metadata["calculations"].items():
+            metadata[key] = dict(value["values"]) if key in self.metadata.get("pipelines", []) else value
+
+        return metadata
+
+    def LoadPipeline(self, pipelineKey:str) -> dict:
+        pipelineMetadata = self.metadata["calculations"][pipelineKey]
+        prefix = pipelineKey + "/"
+
+        pipelineResult = {}
+
+        for key in pipelineMetadata["keyOrder"]:
+            if key == vectorKey:
+                pipelineResult[key] = {
+                    linesKey: CSRToLists(self.archive[prefix + "lineOffsets"], self.archive[prefix + "lineIndices"]),
+                    pointsKey: self.archive[prefix + pointsKey].tolist(),
+                    clusterKey: CSRToLists(self.archive[prefix + "clusterOffsets"], self.archive[prefix + "clusterIndices"])
+                }
+            elif key in pipelineMetadata["arrays"]:
+                pipelineResult[key] = self.archive[prefix + "stats/" + key].tolist()
+            else:
+                pipelineResult[key] = pipelineMetadata["values"][key]
+
+        return pipelineResult
+
+    def Load(self) -> dict:
+        calculations = {}
+
+        for key, value in self.metadata["calculations"].items():
+            calculations[key] = self.LoadPipeline(key) if key in self.metadata.get("pipelines", []) else value
+
+        return calculations
+
+def IsCalculationsFile(fileName:str) -> bool:
+    return fileName.endswith(calculationsStoreSuffix) or fileName.endswith(calculationsJSONSuffix)
+
+def CalculationsBaseName(fileName:str) -> str:
+    for suffix in [calculationsStoreSuffix, calculationsJSONSuffix]:
+        if fileName.endswith(suffix):
+            return fileName[:-len(suffix)]
+
+    return fileName
+
+def CalculationsPath(calculationsDirectory:str, baseFileName:str) -> str:
+    #the binary store, or the JSON file if that's all there is (results from older versions, or exports)
+    storePath = os.path.join(calculationsDirectory, baseFileName + calculationsStoreSuffix)
+    jsonPath = os.path.join(calculationsDirectory, baseFileName + calculationsJSONSuffix)
+
+    if not os.path.exists(storePath) and os.path.exists(jsonPath):
+        return jsonPath
+
+    return storePath
+
+def LoadJSON(path:str) -> dict:
+    with open(path, "r") as jsonFile:
+        return json.load(jsonFile)
+
+def LoadCalculations(path:str) -> dict:
+    if path.endswith(calculationsJSONSuffix):
+        return LoadJSON(path)
+
+    with ResultStore(path) as store:
+        return store.Load()
+
+def LoadCalculationsMetadata(path:str) -> dict:
+    #JSON files have no metadata record, so they're read in full
+    if path.endswith(calculationsJSONSuffix):
+        return LoadJSON(path)
+
+    with ResultStore(path) as store:
+        return store.Metadata()
+
+def LoadCalculationsPipeline(path:str, pipelineKey:str) -> dict:
+    if path.endswith(calculationsJSONSuffix):
+        return LoadJSON(path)[pipelineKey]
+
+    with ResultStore(path) as store:
+        return store.LoadPipeline(pipelineKey)
+
+def SaveCalculations(calculations:dict, path:str, compress:bool=True) -> None:
+    #saves in whichever format path is
+    if path.endswith(calculationsJSONSuffix):
+        WriteJSONAtomically(calculations, path)
+    else:
+        SaveResultStore(calculations, path, compress)
+
+def IsJSONExportCurrent(storePath:str, jsonPath:str) -> bool:
+    #the JSON is written after the store, so an older JSON is from before the store last changed
+    if not os.path.exists(jsonPath):
+        return False
+
+    return not os.path.exists(storePath) or os.path.getmtime(jsonPath) >= os.path.getmtime(storePath)
+
+def ExportCalculationsJSON(storePath:str, jsonPath:str=None) -> str:
+    #writes the pretty-printed JSON older versions saved, next to the store by default
+    if jsonPath is None:
+        jsonPath = storePath[:-len(calculationsStoreSuffix)] + calculationsJSONSuffix
+
+    WriteJSONAtomically(LoadCalculations(storePath), jsonPath)
+
+    return jsonPath
+
+class CachedCalculations:
+    #one file's calculations, a store's pipelines are only loaded the first time they're asked for
+    def __init__(self, fileState:tuple, calculations:dict, store:ResultStore=None) -> None:
+        self.fileState = fileState
+        self.store = store
+
+        #every key in the file in order, and the values loaded so far
+        self.keys = list(store.metadata["calculations"]) if store is not None else list(calculations)
+        self.values = calculations
+
+    def Get(self, pipelineKeys:list[str]=None) -> dict:
+        if self.store is None:
+            return self.values
+
+        storedPipelines = self.store.PipelineKeys()
+        requestedPipelines = storedPipelines if pipelineKeys is None else [key for key in pipelineKeys if key in storedPipelines]
+
+        for key in requestedPipelines:
+            if key not in self.values:
+                self.values[key] = self.store.LoadPipeline(key)
+
+        return {key: self.values[key] for key in self.keys if key not in storedPipelines or key in requestedPipelines}
+
+class CalculationsCache:
+    """
+    In-memory LRU cache of calculations files.
+
+    A binary store's pipelines are only loaded the first time they're asked for, so showing
+    some of an image's pipelines doesn't load all of them. Entries are checked against the
+    file's modification time, size and inode, so a file replaced by a batch run is read again.
+    Loaded calculations are shared with every caller, save changes through Save so the file
+    and the cache stay in step. At most maxEntries files are kept.
+    """
+
+    def __init__(self, maxEntries:int) -> None:
+        self.maxEntries = maxEntries
+
+        self.entries:OrderedDict[str, CachedCalculations] = OrderedDict()
+
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def FileState(path:str) -> tuple:
+        fileStats = os.stat(path)
+        return (fileStats.st_mtime_ns, fileStats.st_size, fileStats.st_ino)
+
+    @staticmethod
+    def Open(path:str, fileState:tuple) -> CachedCalculations:
+        if path.endswith(calculationsJSONSuffix):
+            return CachedCalculations(fileState, LoadJSON(path))
+
+        #read into memory so no file handle is kept, an open file can't be replaced on Windows
+        store = ResultStore(path, inMemory=True)
+        storedPipelines = store.PipelineKeys()
+
+        return CachedCalculations(fileState, {key: value for key, value in store.Metadata().items() if key not in storedPipelines}, store)
+
+    def Get(self, path:str, pipelineKeys:list[str]=None) -> dict:
+        #the file's calculations with only pipelineKeys loaded (every pipeline if None), the other pipelines are left out
+        path = os.path.abspath(path)
+        fileState = self.FileState(path)
+
+        with self.lock:
+            entry = self.entries.get(path)
+
+            if entry is None or entry.fileState != fileState:
+                entry = self.Open(path, fileState)
+                self.Put(path, entry)
+            else:
+                self.entries.move_to_end(path)
+
+            return entry.Get(pipelineKeys)
+
+    def Save(self, calculations:dict, path:str, compress:bool=True, exportJSON:bool=False) -> None:
+        #calculations must have every pipeline, the file is replaced
+        path = os.path.abspath(path)
+
+        SaveCalculations(calculations, path, compress)
+
+        #keeps an exported JSON file in step with the store
+        if exportJSON and path.endswith(calculationsStoreSuffix):
+            WriteJSONAtomically(calculations, path[:-len(calculationsStoreSuffix)] + calculationsJSONSuffix)
+
+        with self.lock:
+            self.Put(path, CachedCalculations(self.FileState(path), calculations))
+
+    def Put(self, path:str, entry:CachedCalculations) -> None:
+        #called with the lock held
+        self.entries[path] = entry
+        self.entries.move_to_end(path)
+
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,122 @@
+import json
+import os
+import time
+
+from source.Helpers.BatchEngine import SkeletonJobSettings
+
+runJournalFileName = "runJournal.jsonl"
+
+def RunJournalPath(outputDirectory:str) -> str:
+    return os.path.join(outputDirectory, "Calculations", runJournalFileName)
+
+def SettingsToJSON(settings:SkeletonJobSettings) -> dict:
+    #the step cache isn't recorded, it belongs to whoever resumes the run
+    return {
+        "inputDirectory": settings.inputDirectory,
+        "outputDirectory": settings.outputDirectory,
+        "pipelines": {pipelineKey: [parameters, steps] for pipelineKey, (parameters, steps) in settings.pipelines.items()},
+        "pipelineSteps": settings.pipelineSteps,
+        "precision": settings.precision,
+        "compressResults": settings.compressResults,
+        "exportJSON": settings.exportJSON
+    }
+
+def SettingsFromJSON(settingsData:dict, stepCacheDirectory:str=None, stepCacheSizeBytes:int=0) -> SkeletonJobSettings:
+    pipelines = {pipelineKey: (parameters, steps) for pipelineKey, (parameters, steps) in settingsData["pipelines"].items()}
+
+    return SkeletonJobSettings(settingsData["inputDirectory"], settingsData["outputDirectory"], pipelines, settingsData["pipelineSteps"],
+                               stepCacheDirectory, stepCacheSizeBytes, settingsData["precision"],
+                               settingsData.get("compressResults", True), settingsData.get("exportJSON", False))
+
+class RunJournalState:
+    def __init__(self, settingsData:dict, jobs:list[tuple[str, str]], completed:set[tuple[str, str]], finished:bool) -> None:
+        self.settingsData = settingsData
+        self.jobs = jobs
+
+        #(file name, pipeline key) units that were saved
+        self.completed = completed
+        self.finished = finished
+
+    def RemainingJobs(self) -> list[tuple[str, str]]:
+        pipelineKeys = list(self.settingsData["pipelines"])
+        return [(fileName, sample) for fileName, sample in self.jobs if any((fileName, pipelineKey) not in self.completed for pipelineKey in pipelineKeys)]
+
+class RunJournal:
+    """
+    Append-only record of a batch run so an interrupted run can be resumed.
+
+    Each line is one JSON object. The first describes the run (its settings and jobs), then a
+    line is added once an image's pipelines are saved, and a last line marks the run as
+    finished. Lines are flushed to disk as they're written, and a line cut short by a crash
+    is ignored when the journal is read back.
+    """
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.file = None
+
+    def Start(self, settings:SkeletonJobSettings, jobs:list[tuple[str, str]]) -> None:
+        #replaces the journal of any previous run
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self.Close()
+        self.file = open(self.path, "w")
+        self.WriteEntry({"run": {"settings": SettingsToJSON(settings), "jobs": [list(job) for job in jobs], "startTime": time.time()}})
+
+    def Reopen(self) -> None:
+        #continues the existing journal when a run is resumed
+        self.Close()
+        self.file = open(self.path, "a+")
+
+        #a line cut short by a crash would swallow the next entry
+        if self.file.tell() > 0:
+            self.file.seek(self.file.tell() - 1)
+            if self.file.read(1) != "\n":
+                self.file.write("\n")
+                self.file.flush()
+
+    def RecordCompleted(self, fileName:str, pipelineKeys:list[str]) -> None:
+        self.WriteEntry({"image": fileName, "pipelines": pipelineKeys})
+
+    def RecordFinished(self) -> None:
+        self.WriteEntry({"finished": time.time()})
+
+    def WriteEntry(self, entry:dict) -> None:
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def Close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def Load(self) -> RunJournalState:
+        #None if there's no journal or its first line is unreadable
+        if not os.path.exists(self.path):
+            return None
+
+        settingsData = None
+        jobs = []
+        completed = set()
+        finished = False
+
+        with open(self.path, "r") as journalFile:
+            for line in journalFile:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                if "run" in entry:
+                    settingsData = entry["run"]["settings"]
+                    jobs = [tuple(job) for job in entry["run"]["jobs"]]
+                elif "image" in entry:
+                    completed.update((entry["image"], pipelineKey) for pipelineKey in entry["pipelines"])
+                elif "finished" in entry:
+                    finished = True
+
+        if settingsData is None:
+            return None
+
+        return RunJournalState(settingsData, jobs, completed, finished)
@@ -0,0 +1,31 @@
+from PySide6.QtCore import QThread, Signal
+
+from source.Helpers.BatchEngine import SkeletonBatch
+
+class SkeletonBatchThread(QThread):
+    """
+    Runs a SkeletonBatch off the UI thread and reports each image through signals.
+
+    Signals are emitted from the background thread, so connected slots on UI objects run on
+    the UI thread. Cancel() stops images that haven't started, ones already being created
+    still finish so their files are never left half written.
+    """
+
+    #file name and the error message, empty if the image succeeded
+    ImageFinished = Signal(str, str)
+    BatchFinished = Signal()
+
+    def __init__(self, batch:SkeletonBatch, parent=None) -> None:
+        super().__init__(parent)
+
+        self.batch = batch
+
+    def run(self) -> None:
+        try:
+            for fileName, error in self.batch.Run():
+                self.ImageFinished.emit(fileName, "" if error is None else str(error))
+        finally:
+            self.BatchFinished.emit()
+
+    def Cancel(self) -> None:
+        self.batch.Cancel()
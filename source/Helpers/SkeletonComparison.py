@@ -0,0 +1,59 @@
+import numpy as np
+import os
+
+from PIL import Image
+
+from source.Helpers.HelperFunctions import skeletonKey, vectorKey, pointsKey, linesKey, NormalizeImageArray, comparisonFunctionMap, densifyComparisonKeys
+from source.Helpers.HelperFunctions import RasterComparisonScores, RasterizeSkeleton, rasterComparisonKeys
+from source.Helpers.CreateSkeleton import CallSkeletonize
+from source.Helpers.VectorizeSkeleton import VectorizeSkeleton
+
+def LoadReferenceSkeleton(filePath:str) -> tuple[np.ndarray, list[list[int]], list[tuple[float, float]]]:
+    #skeletonizes and vectorizes a hand-drawn or externally generated skeleton image
+    referenceImageArray = np.asarray(Image.open(filePath), dtype=np.float64)
+    referenceImageArray = NormalizeImageArray(referenceImageArray)
+
+    referenceSkeleton = CallSkeletonize(referenceImageArray, {})
+    referenceLines, referencePoints, _ = VectorizeSkeleton(referenceSkeleton)
+
+    return referenceSkeleton, referenceLines, referencePoints
+
+def CompareRasters(pipelineResults:dict, referenceSkeleton:np.ndarray, referenceLines:list[list[int]], referencePoints:list[tuple[float, float]]) -> dict:
+    generatedVectors = pipelineResults[vectorKey]
+
+    #saved skeleton image, redrawn from the lines if it's missing
+    generatedSkeletonPath = pipelineResults.get(skeletonKey)
+    if isinstance(generatedSkeletonPath, str) and os.path.exists(generatedSkeletonPath):
+        generatedSkeleton = np.asarray(Image.open(generatedSkeletonPath).convert("L")) > 127
+    else:
+        generatedSkeleton = RasterizeSkeleton(generatedVectors[linesKey], generatedVectors[pointsKey], referenceSkeleton.shape)
+
+    #skeletons traced at a different resolution are redrawn on the generated skeleton's pixel grid
+    if referenceSkeleton.shape != generatedSkeleton.shape:
+        referenceSkeleton = RasterizeSkeleton(referenceLines, referencePoints, generatedSkeleton.shape)
+
+    return RasterComparisonScores(generatedSkeleton, referenceSkeleton)
+
+def CompareVectors(pipelineResults:dict, referenceLines:list[list[int]], referencePoints:list[tuple[float, float]], densify:bool=False) -> dict:
+    generatedVectors = pipelineResults[vectorKey]
+
+    result = {}
+    generatedSkeleton = (generatedVectors[linesKey], generatedVectors[pointsKey])
+    referenceSkeleton = (referenceLines, referencePoints)
+    for comparisonStatKey in comparisonFunctionMap:
+        if comparisonStatKey in densifyComparisonKeys:
+            result[comparisonStatKey] = comparisonFunctionMap[comparisonStatKey](generatedSkeleton, referenceSkeleton, densify)
+        else:
+            result[comparisonStatKey] = comparisonFunctionMap[comparisonStatKey](generatedSkeleton, referenceSkeleton)
+
+    return result
+
+def CompareToReference(pipelineResults:dict, referenceSkeleton:np.ndarray, referenceLines:list[list[int]], referencePoints:list[tuple[float, float]], densify:bool=False) -> dict:
+    #every comparisonFunctionMap metric followed by the raster scores (rasterComparisonKeys)
+    result = CompareVectors(pipelineResults, referenceLines, referencePoints, densify)
+    result.update(CompareRasters(pipelineResults, referenceSkeleton, referenceLines, referencePoints))
+
+    return result
+
+#column order of CompareToReference results
+comparisonResultKeys = list(comparisonFunctionMap.keys()) + rasterComparisonKeys
@@ -0,0 +1,121 @@
+import numpy as np
+
+from itertools import chain
+
+def ListsToCSR(lists:list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    #offsets[i]:offsets[i + 1] is the slice of indices belonging to list i
+    lengths = np.fromiter((len(item) for item in lists), dtype=np.int64, count=len(lists))
+
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    indices = np.fromiter(chain.from_iterable(lists), dtype=np.int64, count=offsets[-1])
+
+    return offsets, indices
+
+def CSRToLists(offsets:np.ndarray, indices:np.ndarray) -> list[list[int]]:
+    flatIndices = indices.tolist()
+    offsets = offsets.tolist()
+
+    return [flatIndices[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+def SegmentsFromCSR(lineOffsets:np.ndarray, lineIndices:np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    #every pair of consecutive points on a line, returned as start point indices, end point indices and line indices
+    lineSizes = np.diff(lineOffsets)
+
+    isSegmentStart = np.ones(len(lineIndices), dtype=bool)
+    isSegmentStart[lineOffsets[1:][lineSizes > 0] - 1] = False
+
+    segmentPositions = np.flatnonzero(isSegmentStart)
+    segmentLines = np.repeat(np.arange(len(lineSizes)), np.maximum(lineSizes - 1, 0))
+
+    return lineIndices[segmentPositions], lineIndices[segmentPositions + 1], segmentLines
+
+def LineLengthsFromCSR(points:np.ndarray, lineOffsets:np.ndarray, lineIndices:np.ndarray) -> np.ndarray:
+    startIndices, endIndices, segmentLines = SegmentsFromCSR(lineOffsets, lineIndices)
+
+    segmentVectors = points[endIndices] - points[startIndices]
+    segmentLengths = np.sqrt(np.einsum("ij,ij->i", segmentVectors, segmentVectors))
+
+    return np.bincount(segmentLines, weights=segmentLengths, minlength=len(lineOffsets) - 1)
+
+class SkeletonGraph:
+    """
+    Array-backed version of the lines, points and clusters produced by VectorizeSkeleton.
+
+    Points are an N x 2 float32 array. Lines and clusters are stored CSR-style, line i is
+    lineIndices[lineOffsets[i]:lineOffsets[i + 1]] (indices into points) and cluster i is
+    clusterIndices[clusterOffsets[i]:clusterOffsets[i + 1]] (indices into lines).
+    lineClusters maps every line to its cluster, or -1 if it isn't in one.
+    """
+
+    def __init__(self, points:np.ndarray, lineOffsets:np.ndarray, lineIndices:np.ndarray,
+                 clusterOffsets:np.ndarray, clusterIndices:np.ndarray) -> None:
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+
+        self.lineOffsets = np.asarray(lineOffsets, dtype=np.int64)
+        self.lineIndices = np.asarray(lineIndices, dtype=np.int64)
+
+        self.clusterOffsets = np.asarray(clusterOffsets, dtype=np.int64)
+        self.clusterIndices = np.asarray(clusterIndices, dtype=np.int64)
+
+        self.lineClusters = np.full(self.NumLines(), -1, dtype=np.int64)
+        self.lineClusters[self.clusterIndices] = np.repeat(np.arange(self.NumClusters()), np.diff(self.clusterOffsets))
+
+    @classmethod
+    def FromLists(cls, lines:list[list[int]], points:list[tuple[float, float]], clusters:list[list[int]]) -> "SkeletonGraph":
+        lineOffsets, lineIndices = ListsToCSR(lines)
+        clusterOffsets, clusterIndices = ListsToCSR(clusters)
+
+        return cls(np.asarray(points, dtype=np.float32), lineOffsets, lineIndices, clusterOffsets, clusterIndices)
+
+    def ToLists(self) -> tuple[list[list[int]], list[tuple[float, float]], list[list[int]]]:
+        #same order as VectorizeSkeleton: lines, points, clusters
+        lines = CSRToLists(self.lineOffsets, self.lineIndices)
+        points = [tuple(point) for point in self.points.astype(np.float64).tolist()]
+        clusters = CSRToLists(self.clusterOffsets, self.clusterIndices)
+
+        return lines, points, clusters
+
+    def NumLines(self) -> int:
+        return len(self.lineOffsets) - 1
+
+    def NumClusters(self) -> int:
+        return len(self.clusterOffsets) - 1
+
+    def Line(self, lineIndex:int) -> np.ndarray:
+        return self.lineIndices[self.lineOffsets[lineIndex]:self.lineOffsets[lineIndex + 1]]
+
+    def Cluster(self, clusterIndex:int) -> np.ndarray:
+        return self.clusterIndices[self.clusterOffsets[clusterIndex]:self.clusterOffsets[clusterIndex + 1]]
+
+    def LineSizes(self) -> np.ndarray:
+        return np.diff(self.lineOffsets)
+
+    def ClusterSizes(self) -> np.ndarray:
+        return np.diff(self.clusterOffsets)
+
+    def Segments(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return SegmentsFromCSR(self.lineOffsets, self.lineIndices)
+
+    def LineLengths(self) -> np.ndarray:
+        return LineLengthsFromCSR(self.points.astype(np.float64), self.lineOffsets, self.lineIndices)
+
+    def ClusterLengths(self) -> np.ndarray:
+        return np.bincount(self.lineClusters[self.clusterIndices], weights=self.LineLengths()[self.clusterIndices], minlength=self.NumClusters())
+
+    def SegmentDistances(self, point:tuple[float, float]) -> np.ndarray:
+        #distance from a point to every segment, clamped to the segment's endpoints
+        startIndices, endIndices, _ = self.Segments()
+
+        points = self.points.astype(np.float64)
+        starts = points[startIndices]
+        startToEnd = points[endIndices] - starts
+        startToPoint = np.asarray(point, dtype=np.float64) - starts
+
+        squaredLengths = np.einsum("ij,ij->i", startToEnd, startToEnd)
+        projections = np.einsum("ij,ij->i", startToPoint, startToEnd) / np.where(squaredLengths == 0, 1.0, squaredLengths)
+        projections = np.clip(projections, 0.0, 1.0)
+
+        closestPoints = starts + projections[:, None] * startToEnd
+        return np.linalg.norm(np.asarray(point, dtype=np.float64) - closestPoints, axis=1)
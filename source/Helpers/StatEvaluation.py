@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from source.Helpers.GeometryContext import GeometryContext
+from source.Helpers.HelperFunctions import statFunctionMap, intermediateFunctionMap, inputsKey, CallStatFunction
+
+def GetStatInputs(key:str) -> list[str]:
+    #only the inputs that are other stats or intermediate values, raw inputs are always available
+    entry = statFunctionMap[key] if key in statFunctionMap else intermediateFunctionMap[key]
+    return [inputKey for inputKey in entry.get(inputsKey, []) if inputKey in statFunctionMap or inputKey in intermediateFunctionMap]
+
+def ResolveStatOrder(requestedStats:list[str]) -> list[str]:
+    #requested stats plus everything they depend on, each one after all of its inputs
+    order = []
+    state = {}
+
+    def Visit(key:str, path:list[str]) -> None:
+        if state.get(key) == "done":
+            return
+
+        if state.get(key) == "visiting":
+            raise ValueError(f"Stat dependency cycle: {' -> '.join(path + [key])}")
+
+        if key not in statFunctionMap and key not in intermediateFunctionMap:
+            raise ValueError(f"Unknown stat or intermediate value: {key}")
+
+        state[key] = "visiting"
+        for inputKey in GetStatInputs(key):
+            Visit(inputKey, path + [key])
+
+        state[key] = "done"
+        order.append(key)
+
+    for key in requestedStats:
+        Visit(key, [])
+
+    return order
+
+def EvaluateStats(context:GeometryContext, requestedStats:list[str]=None, maxWorkers:int=None) -> dict:
+    """
+    Computes the requested stats (all of them by default) for one skeleton.
+
+    Only the intermediate values the requested stats need are computed, each one once.
+    Stats whose inputs are ready run at the same time on a thread pool, most of the
+    heavy lifting happens in numpy/scipy which releases the GIL. Set maxWorkers to 1 to
+    run everything on the calling thread.
+    """
+
+    if requestedStats is None:
+        requestedStats = list(statFunctionMap.keys())
+
+    order = ResolveStatOrder(requestedStats)
+
+    if maxWorkers == 1 or len(order) <= 1:
+        for key in order:
+            context.SetValue(key, CallStatFunction(key, context))
+    else:
+        remainingInputs = {key: set(GetStatInputs(key)) for key in order}
+        dependents = {key: [] for key in order}
+        for key in order:
+            for inputKey in remainingInputs[key]:
+                dependents[inputKey].append(key)
+
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            running = {}
+
+            def SubmitReady() -> None:
+                for key in [key for key, inputs in remainingInputs.items() if len(inputs) == 0]:
+                    del remainingInputs[key]
+                    running[executor.submit(CallStatFunction, key, context)] = key
+
+            SubmitReady()
+            while len(running) > 0:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    key = running.pop(future)
+                    context.SetValue(key, future.result())
+
+                    for dependent in dependents[key]:
+                        remainingInputs[dependent].discard(key)
+
+                SubmitReady()
+
+    #intermediate values stay in the context, only stats are returned
+    return {key: context.GetValue(key) for key in statFunctionMap if key in requestedStats}
@@ -0,0 +1,134 @@
+import numpy as np
+import hashlib
+import json
+import os
+import threading
+
+#bump when a step function's output changes so old cache entries aren't reused
+stepCacheVersion = 1
+
+class StepCache:
+    """
+    On-disk cache of the image after each pipeline step.
+
+    An entry's key combines the input file's contents, the step function, its parameters and
+    the keys of every step before it, so changing a step's parameters only invalidates that
+    step and the ones after it. Entries are .npy files, reading one marks it as recently used,
+    and the least recently used entries are deleted once the cache grows past maxBytes.
+    """
+
+    def __init__(self, directory:str, maxBytes:int) -> None:
+        self.directory = directory
+        self.maxBytes = maxBytes
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        #(modification time, size, hash) by path, so files are only read once per run and a
+        #changed file replaces its old hash instead of adding another
+        self.fileHashes = {}
+
+        self.lock = threading.Lock()
+        self.totalBytes = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith(".npy"))
+
+    def FileKey(self, filePath:str) -> str:
+        fileStats = os.stat(filePath)
+        absolutePath = os.path.abspath(filePath)
+        fileState = (fileStats.st_mtime_ns, fileStats.st_size)
+
+        cachedHash = self.fileHashes.get(absolutePath)
+        if cachedHash is not None and cachedHash[:2] == fileState:
+            return cachedHash[2]
+
+        fileHash = hashlib.sha256()
+        with open(filePath, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                fileHash.update(chunk)
+
+        self.fileHashes[absolutePath] = fileState + (fileHash.hexdigest(),)
+
+        return self.fileHashes[absolutePath][2]
+
+    @staticmethod
+    def StepKey(upstreamKey:str, stepFunctionKey:str, parameters:dict) -> str:
+        keyData = json.dumps([stepCacheVersion, upstreamKey, stepFunctionKey, parameters], sort_keys=True, default=str)
+        return hashlib.sha256(keyData.encode("utf-8")).hexdigest()
+
+    def EntryPath(self, key:str) -> str:
+        return os.path.join(self.directory, key + ".npy")
+
+    def Get(self, key:str) -> np.ndarray | None:
+        entryPath = self.EntryPath(key)
+
+        try:
+            array = np.load(entryPath, allow_pickle=False)
+        except (FileNotFoundError, ValueError, OSError):
+            #missing, evicted by another process or partially written
+            return None
+
+        #the modification time is the entry's last use
+        try:
+            os.utime(entryPath)
+        except OSError:
+            pass
+
+        return array
+
+    def Put(self, key:str, array:np.ndarray) -> None:
+        if self.maxBytes <= 0:
+            return
+
+        entryPath = self.EntryPath(key)
+        temporaryPath = f"{entryPath}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        #write then rename so other readers never see a partial file
+        try:
+            with open(temporaryPath, "wb") as file:
+                np.save(file, np.asarray(array), allow_pickle=False)
+
+            entrySize = os.path.getsize(temporaryPath)
+
+            with self.lock:
+                #an entry written again replaces the old file, so only the difference is added
+                try:
+                    replacedSize = os.path.getsize(entryPath)
+                except OSError:
+                    replacedSize = 0
+
+                os.replace(temporaryPath, entryPath)
+
+                self.totalBytes += entrySize - replacedSize
+
+                if self.totalBytes > self.maxBytes:
+                    self.Evict()
+        finally:
+            #only still there if writing or replacing failed
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+
+    def Evict(self) -> None:
+        #other processes may share the directory, so the real size is recounted before deleting anything
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".npy"):
+                continue
+
+            try:
+                entryStats = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((entryStats.st_mtime_ns, entryStats.st_size, entry.path))
+
+        entries.sort()
+        self.totalBytes = sum(entrySize for _, entrySize, _ in entries)
+
+        for _, entrySize, entryPath in entries:
+            if self.totalBytes <= self.maxBytes:
+                break
+
+            try:
+                os.remove(entryPath)
+            except FileNotFoundError:
+                pass
+
+            self.totalBytes -= entrySize
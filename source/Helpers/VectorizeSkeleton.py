@@ -2,100 +2,105 @@ import numpy as np
 import matplotlib.pyplot as plt
 import math
 
-from collections import defaultdict, Counter, deque
+from collections import deque
+from itertools import chain
+from scipy.sparse import csr_matrix, bmat
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 
-def GetInitialLines(skeleton:np.ndarray) -> tuple[list, list]:
-    #create stack
-    stack = []
+from source.Helpers.SkeletonGraph import ListsToCSR, CSRToLists
 
-    #create line assignment array, assign each point to a line or junction
-    lineAssignments = np.zeros_like(skeleton)
+def GetPixelAdjacency(skeleton:np.ndarray) -> tuple[csr_matrix, np.ndarray, np.ndarray]:
+    #index of every white pixel in row-major order, -1 for background
+    whitePixels = skeleton == 1
+    ys, xs = np.nonzero(whitePixels)
 
-    #create point assignment array
-    pointAssignments = np.full_like(skeleton, -1)
+    pixelIndices = np.full(skeleton.shape, -1, dtype=np.int32 if skeleton.size < 2**31 else np.int64)
+    pixelIndices[ys, xs] = np.arange(len(ys))
 
-    #create line list - line num: [point1, point2, ...]
-    lines:list[list[int]] = []
+    #pair every pixel with its 8-connected white neighbors, only looking forward so each edge is found once
+    height, width = skeleton.shape
+    rows = []
+    cols = []
+    for yOffset, xOffset in [(0, 1), (1, -1), (1, 0), (1, 1)]:
+        source = pixelIndices[0:height - yOffset, max(0, -xOffset):width - max(0, xOffset)]
+        target = pixelIndices[yOffset:height, max(0, xOffset):width - max(0, -xOffset)]
 
-    #create point list - point num: (x, y)
-    points = []
+        connected = np.logical_and(source >= 0, target >= 0)
+        rows.append(source[connected])
+        cols.append(target[connected])
 
-    offsets = [-1, 0, 1]
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
 
-    #create x and y indices
-    #loop through array with x and y indices
+    numPixels = len(ys)
+    adjacency = csr_matrix((np.ones(len(rows) * 2, dtype=np.int8), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))), shape=(numPixels, numPixels))
 
-    for y in range(skeleton.shape[0]):
-        for x in range(skeleton.shape[1]):
-            #if array = 1 and hasn't been assigned yet, add to stack
-            if skeleton[y][x] == 1 and lineAssignments[y][x] == 0:
-                stack.append((x, y, -1))
+    return adjacency, xs, ys
 
-            #if stack empty, continue
-            if len(stack) == 0:
-                continue
+def GetInitialLines(skeleton:np.ndarray) -> tuple[list, list]:
+    """
+    Splits the skeleton into lines with a breadth-first walk from each unvisited pixel in raster order.
 
-            #stack element: (x index, y index, line index)
-            #while stack not empty
-            while len(stack) > 0:
-                #pop first element
-                pointX, pointY, lineInd = stack[0]
-                del stack[0]
+    A pixel with more than one unvisited neighbor is a junction, each of those neighbors starts a
+    new line beginning at the junction. Only white pixels are visited and their neighbors come
+    from the pixel adjacency graph, in the same order as scanning the 3x3 neighborhood row by row.
+    """
+    adjacency, xs, ys = GetPixelAdjacency(skeleton)
 
-                if lineAssignments[pointY][pointX] == 1:
-                    continue
+    #ascending pixel index is row-major order, the same order as scanning the neighborhood
+    adjacency.sort_indices()
+    indptr = adjacency.indptr.tolist()
+    neighbors = adjacency.indices.tolist()
 
-                pointNum = len(points)
+    xs = xs.tolist()
+    ys = ys.tolist()
 
-                #mark point on line
-                if lineInd >= 0:
-                    lines[lineInd].append(pointNum)
-                else:
-                    lineInd = len(lines)
-                    newLine = [pointNum]
-                    lines.append(newLine)
+    #create line list - line num: [point1, point2, ...]
+    lines:list[list[int]] = []
 
-                #add point to point list
-                points.append((pointX, pointY))
+    #create point list - point num: (x, y), numbered in the order points are reached
+    points = []
 
-                #mark on point assignment array
-                pointAssignments[pointY][pointX] = pointNum
+    assigned = [False] * len(xs)
 
-                #mark on line assignment array
-                lineAssignments[pointY][pointX] = 1
+    #queue element: (pixel index, line index), -1 starts a new line
+    queue = deque()
 
-                #loop through neighbor offsets
-                neighbors = []
+    for startPixel in range(len(xs)):
+        if assigned[startPixel]:
+            continue
 
-                for yOffset in offsets:
-                    for xOffset in offsets:
-                        if pointY + yOffset < 0 or pointY + yOffset >= skeleton.shape[0]:
-                            continue
+        queue.append((startPixel, -1))
+
+        while len(queue) > 0:
+            pixel, lineInd = queue.popleft()
+
+            if assigned[pixel]:
+                continue
 
-                        if pointX + xOffset < 0 or pointX + xOffset >= skeleton.shape[1]:
-                            continue
+            pointNum = len(points)
 
-                        if xOffset == 0 and yOffset == 0:
-                            continue
+            #mark point on line
+            if lineInd >= 0:
+                lines[lineInd].append(pointNum)
+            else:
+                lineInd = len(lines)
+                lines.append([pointNum])
 
-                        #count number of unassigned white pixels nearby
-                        if skeleton[pointY + yOffset][pointX + xOffset] == 1 and lineAssignments[pointY + yOffset][pointX + xOffset] == 0:
-                            neighbors.append((pointX + xOffset, pointY + yOffset))
+            points.append((xs[pixel], ys[pixel]))
+            assigned[pixel] = True
 
-                #determine if junction, unassigned white pixels nearby > 1
-                isJunction = len(neighbors) > 1
+            unassignedNeighbors = [neighbor for neighbor in neighbors[indptr[pixel]:indptr[pixel + 1]] if not assigned[neighbor]]
 
-                #loop through neighbors
-                for neighbor in neighbors:
-                    #if not junction, add to stack as an extension of the lines
-                    if not isJunction:
-                        stack.append((neighbor[0], neighbor[1], lineInd))
-                    else:
-                    #if junction, create new line, add current point as first point on the line, 
-                    #add neighbor to stack as extension of that line
-                        newLine = [pointNum]
-                        stack.append((neighbor[0], neighbor[1], len(lines)))
-                        lines.append(newLine)
+            #if junction, every neighbor starts a new line beginning at the current point
+            if len(unassignedNeighbors) > 1:
+                for neighbor in unassignedNeighbors:
+                    queue.append((neighbor, len(lines)))
+                    lines.append([pointNum])
+            else:
+                for neighbor in unassignedNeighbors:
+                    queue.append((neighbor, lineInd))
 
     return lines, points
 
@@ -110,59 +115,90 @@ def RemoveShortLines(lines:list[list[int]], minLength:int) -> list[list[int]]:
 
     return lines
 
-def perpendicular_distance(point:tuple[int, int], start:tuple[int, int], end:tuple[int, int]):
-    """Calculate the perpendicular distance from a point to a line segment."""
-    x0, y0 = point
-    x1, y1 = start
-    x2, y2 = end
+def batch_rdp(points:list[tuple[float, float]], polylines:list[list[int]], epsilon:float) -> list[list[int]]:
+    """Simplify every polyline at once using an iterative RDP algorithm.
 
-    if (x1, y1) == (x2, y2):
-        return math.hypot(x0 - x1, y0 - y1)
-
-    num = abs((y2 - y1) * x0 - (x2 - x1) * y0 + x2*y1 - y2*x1)
-    den = math.hypot(y2 - y1, x2 - x1)
-    return num / den
-
-def rdp(points:list[tuple[int, int]], polyline:list[int], epsilon:float) -> list[int]:
-    """Simplify the polyline using the RDP algorithm.
+    Each pass takes every segment that still needs checking, across all polylines,
+    computes the perpendicular distance of all of their interior points in one vector
+    operation and splits the segments whose farthest point is further than `epsilon`.
 
     Args:
         points: List of (x, y) tuples.
-        polyline: List of indices into `points` representing the polyline.
+        polylines: List of polylines, each a list of indices into `points`.
         epsilon: Distance threshold for simplification.
 
     Returns:
-        A simplified polyline as a list of indices into `points`.
+        The simplified polylines as lists of indices into `points`.
     """
-    def rdp_recursive(start_idx, end_idx):
-        max_dist = 0.0
-        index = None
-
-        start_point = points[polyline[start_idx]]
-        end_point = points[polyline[end_idx]]
-
-        for i in range(start_idx + 1, end_idx):
-            dist = perpendicular_distance(points[polyline[i]], start_point, end_point)
-            if dist > max_dist:
-                max_dist = dist
-                index = i
-
-        if max_dist > epsilon:
-            # Recursive call
-            left = rdp_recursive(start_idx, index)
-            right = rdp_recursive(index, end_idx)
-            return left[:-1] + right  # avoid duplicating index at the junction
-        else:
-            return [polyline[start_idx], polyline[end_idx]]
+    if len(polylines) == 0:
+        return []
+
+    lengths = np.array([len(polyline) for polyline in polylines], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    flatIndices = np.fromiter(chain.from_iterable(polylines), dtype=np.int64, count=offsets[-1])
+    coordinates = np.asarray(points, dtype=np.float64).reshape(-1, 2)[flatIndices]
+
+    #the first and last point of every polyline are always kept
+    keep = np.zeros(len(flatIndices), dtype=bool)
+    keep[offsets[:-1][lengths > 0]] = True
+    keep[offsets[1:][lengths > 0] - 1] = True
+
+    #segments are stored as start and end positions in the flattened polylines
+    segmentStarts = offsets[:-1][lengths >= 2]
+    segmentEnds = offsets[1:][lengths >= 2] - 1
+
+    while True:
+        hasInterior = segmentEnds - segmentStarts > 1
+        segmentStarts = segmentStarts[hasInterior]
+        segmentEnds = segmentEnds[hasInterior]
+
+        if len(segmentStarts) == 0:
+            break
+
+        #positions of every interior point and the segment each one belongs to
+        interiorCounts = segmentEnds - segmentStarts - 1
+        segmentIds = np.repeat(np.arange(len(segmentStarts)), interiorCounts)
+        interiorOffsets = np.concatenate([[0], np.cumsum(interiorCounts)[:-1]])
+        interior = np.arange(len(segmentIds)) - interiorOffsets[segmentIds] + segmentStarts[segmentIds] + 1
+
+        x0, y0 = coordinates[interior, 0], coordinates[interior, 1]
+        x1, y1 = coordinates[segmentStarts, 0], coordinates[segmentStarts, 1]
+        x2, y2 = coordinates[segmentEnds, 0], coordinates[segmentEnds, 1]
+
+        #perpendicular distance to the line through the segment's endpoints
+        denominators = np.hypot(y2 - y1, x2 - x1)
+        x1, y1, x2, y2 = x1[segmentIds], y1[segmentIds], x2[segmentIds], y2[segmentIds]
+
+        distances = np.zeros(len(interior))
+        isDegenerate = denominators[segmentIds] == 0
+        isRegular = np.logical_not(isDegenerate)
 
-    if len(polyline) < 2:
-        return polyline  # Not enough points to simplify
+        numerators = np.abs((y2 - y1) * x0 - (x2 - x1) * y0 + x2 * y1 - y2 * x1)
+        distances[isRegular] = numerators[isRegular] / denominators[segmentIds][isRegular]
 
-    return rdp_recursive(0, len(polyline) - 1)
+        #segments that start and end on the same point use the distance to that point
+        distances[isDegenerate] = np.hypot((x0 - x1)[isDegenerate], (y0 - y1)[isDegenerate])
+
+        #split segments at their first farthest point
+        maxDistances = np.maximum.reduceat(distances, interiorOffsets)
+        isSplit = maxDistances > epsilon
+
+        candidates = np.flatnonzero(np.logical_and(distances == maxDistances[segmentIds], isSplit[segmentIds]))
+        _, firstCandidates = np.unique(segmentIds[candidates], return_index=True)
+        splitPositions = interior[candidates[firstCandidates]]
+
+        keep[splitPositions] = True
+
+        segmentStarts, segmentEnds = np.concatenate([segmentStarts[isSplit], splitPositions]), np.concatenate([splitPositions, segmentEnds[isSplit]])
+
+    keptIndices = flatIndices[keep].tolist()
+    keptOffsets = np.concatenate([[0], np.cumsum(keep)])[offsets].tolist()
+
+    return [keptIndices[keptOffsets[i]:keptOffsets[i + 1]] for i in range(len(polylines))]
 
 def SimplifyLines(lines:list[list[int]], points:list[tuple[int, int]], maxDist:float) -> tuple[list, list]:
-    for i in range(len(lines)):
-        lines[i] = rdp(points, lines[i], maxDist)
+    lines = batch_rdp(points, lines, maxDist)
 
     return lines, points
 
@@ -191,46 +227,32 @@ def NormalizePoints(points:list[tuple[int, int]], width:int, height:int) -> list
     return newPoints
 
 def merge_nearby_points(points: list[tuple[float, float]], polylines: list[list[int]], max_distance: float):
-    def distance(p1, p2):
-        return math.hypot(p1[0] - p2[0], p1[1] - p2[1])
+    if len(points) == 0:
+        return [polyline[:] for polyline in polylines], []
 
-    # Union-Find structure to group nearby points
-    parent = list(range(len(points)))
+    coordinates = np.asarray(points, dtype=np.float64)
 
-    def find(i):
-        while parent[i] != i:
-            parent[i] = parent[parent[i]]  # Path compression
-            i = parent[i]
-        return i
+    # Find every pair of points within max_distance with a KD-tree instead of comparing all pairs
+    pairs = cKDTree(coordinates).query_pairs(max_distance, output_type="ndarray")
 
-    def union(i, j):
-        pi, pj = find(i), find(j)
-        if pi != pj:
-            parent[pj] = pi
+    # Group nearby points, equivalent to union-find over the pairs
+    pairGraph = csr_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])), shape=(len(points), len(points)))
+    _, clusterLabels = connected_components(pairGraph, directed=False)
 
-    # Merge nearby points
-    for i in range(len(points)):
-        for j in range(i + 1, len(points)):
-            if distance(points[i], points[j]) <= max_distance:
-                union(i, j)
+    # Number clusters in order of their lowest point index
+    _, firstIndices, inverse = np.unique(clusterLabels, return_index=True, return_inverse=True)
+    clusterOrder = np.empty(len(firstIndices), dtype=np.int64)
+    clusterOrder[np.argsort(firstIndices)] = np.arange(len(firstIndices))
+    index_mapping = clusterOrder[inverse]
 
-    # Group indices by root
-    clusters = {}
-    for idx in range(len(points)):
-        root = find(idx)
-        clusters.setdefault(root, []).append(idx)
-
-    # Compute new merged points
-    new_points = []
-    index_mapping = {}  # old_index -> new_index
-    for new_idx, cluster in enumerate(clusters.values()):
-        x_avg = sum(points[i][0] for i in cluster) / len(cluster)
-        y_avg = sum(points[i][1] for i in cluster) / len(cluster)
-        new_points.append((x_avg, y_avg))
-        for old_idx in cluster:
-            index_mapping[old_idx] = new_idx
+    # Compute new merged points, np.add.at sums in point order so averages match a sequential sum
+    sums = np.zeros((len(firstIndices), 2), dtype=np.float64)
+    np.add.at(sums, index_mapping, coordinates)
+    counts = np.bincount(index_mapping)
+    new_points = [tuple(point) for point in (sums / counts[:, None]).tolist()]
 
     # Update polylines with new point indices
+    index_mapping = index_mapping.tolist()
     new_polylines = [
         [index_mapping[idx] for idx in polyline]
         for polyline in polylines
@@ -239,106 +261,158 @@ def merge_nearby_points(points: list[tuple[float, float]], polylines: list[list[
     return new_polylines, new_points
 
 def merge_polylines_at_unique_endpoints(polylines: list[list[int]]) -> list[list[int]]:
-    # Count total occurrences of each point across all polylines
-    point_usage = Counter(pt for poly in polylines for pt in poly)
-    
-    # Map endpoints to the polylines that use them (start or end)
-    endpoint_map = defaultdict(list)
-    for idx, poly in enumerate(polylines):
-        if poly:
-            endpoint_map[poly[0]].append(idx)
-            endpoint_map[poly[-1]].append(idx)
+    """
+    Joins polylines that meet at a point no other polyline uses.
+
+    Endpoints are numbered 2 * polyline index for the start and 2 * polyline index + 1 for the
+    end. Two endpoints are partners if they're the only two uses of a point and belong to
+    different polylines. Going through the polylines in order, each one that hasn't been joined
+    yet takes the partners of its own two endpoints whose polylines are still free, and the
+    endpoints it takes are joined with union-find. Each set is then assembled once, in order of
+    its lowest polyline index.
+
+    This gives the same polylines as the loop it replaced, which only joined a polyline with its
+    direct neighbors and dropped a single point polyline sitting on a taken polyline's far end.
+    """
+    offsets, indices = ListsToCSR(polylines)
+    lengths = np.diff(offsets)
+    numPoints = int(indices.max()) + 1 if len(indices) > 0 else 0
 
+    # Count total occurrences of each point across all polylines
+    point_usage = np.bincount(indices, minlength=numPoints)
+
+    endpoint_points = np.full(2 * len(polylines), -1, dtype=np.int64)
+    nonEmpty = np.flatnonzero(lengths > 0)
+    endpoint_points[2 * nonEmpty] = indices[offsets[nonEmpty]]
+    endpoint_points[2 * nonEmpty + 1] = indices[offsets[nonEmpty + 1] - 1]
+
+    # A point joins two polylines if it occurs exactly twice in total, both times as an endpoint of a different polyline
+    validEndpoints = np.flatnonzero(endpoint_points >= 0)
+    validEndpoints = validEndpoints[np.argsort(endpoint_points[validEndpoints], kind="stable")]
+    sortedPoints = endpoint_points[validEndpoints]
+
+    endpoint_usage = np.bincount(sortedPoints, minlength=numPoints)
+    isPair = np.logical_and(sortedPoints[:-1] == sortedPoints[1:], point_usage[sortedPoints[:-1]] == 2)
+    isPair = np.logical_and(isPair, endpoint_usage[sortedPoints[:-1]] == 2)
+    firstEndpoints = validEndpoints[:-1][isPair]
+    secondEndpoints = validEndpoints[1:][isPair]
+
+    differentPolylines = firstEndpoints // 2 != secondEndpoints // 2
+    firstEndpoints = firstEndpoints[differentPolylines]
+    secondEndpoints = secondEndpoints[differentPolylines]
+
+    partner = np.full(2 * len(polylines), -1, dtype=np.int64)
+    partner[firstEndpoints] = secondEndpoints
+    partner[secondEndpoints] = firstEndpoints
+
+    # Only polylines with a partner can be joined, the rest are left as they are
+    linkedPolylines = np.flatnonzero(np.any(partner.reshape(-1, 2) >= 0, axis=1))
+    partner = partner.tolist()
+
+    # An endpoint whose point is otherwise only used by a single point polyline absorbs that polyline once it's taken
+    singlePoints = np.flatnonzero(lengths == 1)
+    singlePolylineAt = np.full(numPoints, -1, dtype=np.int64)
+    singlePolylineAt[indices[offsets[singlePoints]]] = singlePoints
+
+    isAbsorbing = np.logical_and(point_usage[sortedPoints] == 2, endpoint_usage[sortedPoints] == 3)
+    isAbsorbing = np.logical_and(isAbsorbing, lengths[validEndpoints // 2] > 1)
+
+    absorbs = np.full(2 * len(polylines), -1, dtype=np.int64)
+    absorbs[validEndpoints[isAbsorbing]] = singlePolylineAt[sortedPoints[isAbsorbing]]
+    absorbs = absorbs.tolist()
+
+    # Union-find over endpoint IDs, each polyline's two endpoints start out in one set
+    parent = np.repeat(np.arange(0, 2 * len(polylines), 2), 2).tolist()
+
+    def find(endpoint):
+        while parent[endpoint] != endpoint:
+            parent[endpoint] = parent[parent[endpoint]]  # Path halving
+            endpoint = parent[endpoint]
+        return endpoint
+
+    # A polyline only takes its direct partners, so the far ends of the polylines it takes stay unjoined
     merged = [False] * len(polylines)
-    result = []
+    taken = [-1] * (2 * len(polylines))
+    joiningPolylines = set()
 
-    for i, poly_i in enumerate(polylines):
-        if merged[i] or not poly_i:
+    for i in linkedPolylines.tolist():
+        if merged[i]:
             continue
 
-        current_polyline = poly_i[:]
-        changed = True
-
-        while changed:
-            changed = False
-            for endpoint in [current_polyline[0], current_polyline[-1]]:
-                # Endpoint must occur exactly twice total across all polylines
-                if point_usage[endpoint] != 2:
-                    continue
-
-                # Must be used in exactly two polylines (ours and one other)
-                connections = [j for j in endpoint_map[endpoint] if not merged[j]]
-                if len(connections) != 2:
-                    continue
-
-                # Identify the other polyline
-                other_idx = [j for j in connections if j != i]
-                if not other_idx:
-                    continue
-                j = other_idx[0]
-                poly_j = polylines[j]
-
-                # Merge directionally based on the shared endpoint
-                if endpoint == current_polyline[0]:
-                    if endpoint == poly_j[0]:
-                        poly_j = poly_j[::-1]
-                    current_polyline = poly_j[:-1] + current_polyline
-                elif endpoint == current_polyline[-1]:
-                    if endpoint == poly_j[-1]:
-                        poly_j = poly_j[::-1]
-                    current_polyline = current_polyline + poly_j[1:]
-                else:
-                    continue  # Should never happen
-
-                merged[j] = True
-                changed = True
-
-                # Update i to refer to the "new" polyline in current context
-                i = i if i < j else j  # Keep lowest index as reference
-                break
-
         merged[i] = True
-        result.append(current_polyline)
 
-    return result
+        for endpoint in [2 * i, 2 * i + 1]:
+            other = partner[endpoint]
+            if other < 0 or merged[other // 2]:
+                continue
+
+            merged[other // 2] = True
+            taken[endpoint] = other
+            taken[other] = endpoint
+            parent[find(other)] = find(endpoint)
+            joiningPolylines.add(i)
+
+            # The taken polyline's far end is only checked for a single point polyline to absorb, it adds no
+            # points. One before polyline i was already kept as a polyline of its own.
+            farEndpoint = other ^ 1
+            if absorbs[farEndpoint] > i and not merged[absorbs[farEndpoint]]:
+                merged[absorbs[farEndpoint]] = True
+                parent[find(2 * absorbs[farEndpoint])] = find(endpoint)
+
+    def AssembleSet(i:int) -> list[int]:
+        # Walk backwards from the start of polyline i to the first polyline of its set
+        head = i
+        headReversed = False
+        entryEndpoint = 2 * i
+        while taken[entryEndpoint] >= 0:
+            head = taken[entryEndpoint] // 2
+            headReversed = taken[entryEndpoint] % 2 == 0
+            entryEndpoint = 2 * head + (1 if headReversed else 0)
+
+        # Walk forwards from the head, appending each polyline without the shared endpoint
+        current_polyline = polylines[head][::-1] if headReversed else polylines[head][:]
+
+        exitEndpoint = 2 * head + (0 if headReversed else 1)
+        while taken[exitEndpoint] >= 0:
+            j = taken[exitEndpoint] // 2
+            reverse = taken[exitEndpoint] % 2 == 1
+
+            poly_j = polylines[j][::-1] if reverse else polylines[j]
+            current_polyline.extend(poly_j[1:])
+
+            exitEndpoint = 2 * j + (0 if reverse else 1)
+
+        return current_polyline
+
+    # Each set is assembled once, from the polyline whose endpoints are still its root, which is its lowest polyline
+    startEndpoints = np.arange(0, 2 * len(polylines), 2)
+    isRoot = np.asarray(parent, dtype=np.int64)[startEndpoints] == startEndpoints
+    setPolylines = np.flatnonzero(np.logical_and(lengths > 0, isRoot)).tolist()
+
+    # Polylines that aren't joined to any other are returned as they are, not copied
+    return [AssembleSet(i) if i in joiningPolylines else polylines[i] for i in setPolylines]
 
 def GetClusters(lines) -> list[list[int]]:
-    # Step 1: Build point-to-polyline index
-    point_to_polylines = {}
-    for i, polyline in enumerate(lines):
-        for point in polyline:
-            if point not in point_to_polylines:
-                point_to_polylines[point] = set()
-
-            point_to_polylines[point].add(i)
-
-    # Build connectivity graph between polylines
-    graph = {}
-    for i, polyline in enumerate(lines):
-        if i not in graph:
-            graph[i] = set()
-
-        for point in polyline:
-            for neighbor in point_to_polylines[point]:
-                if neighbor != i:
-                    graph[i].add(neighbor)
-
-    # Step 3: Find connected components using BFS or DFS
-    visited = set()
-    clusters = []
-
-    for i in range(len(lines)):
-        if i not in visited:
-            queue = deque([i])
-            cluster_indices = []
-            while queue:
-                idx = queue.popleft()
-                if idx not in visited:
-                    visited.add(idx)
-                    cluster_indices.append(idx)
-                    queue.extend(graph[idx] - visited)
-            # Create flat list of polylines for the cluster
-            clusters.append(cluster_indices)
+    # Build line-point incidence matrix, lines are connected if they share any point
+    offsets, indices = ListsToCSR(lines)
+    numLines = len(lines)
+    numPoints = int(indices.max()) + 1 if len(indices) > 0 else 0
+
+    lineIds = np.repeat(np.arange(numLines), np.diff(offsets))
+    incidence = csr_matrix((np.ones(len(indices), dtype=np.int8), (lineIds, indices)), shape=(numLines, numPoints))
+
+    # Find connected components of the bipartite line-point graph
+    _, labels = connected_components(bmat([[None, incidence], [incidence.T, None]], format="csr"), directed=False)
+    lineLabels = labels[:numLines]
+
+    # Number clusters in order of their lowest line index, lines within a cluster are in ascending order
+    _, firstLines, inverse = np.unique(lineLabels, return_index=True, return_inverse=True)
+    clusterOrder = np.empty(len(firstLines), dtype=np.int64)
+    clusterOrder[np.argsort(firstLines)] = np.arange(len(firstLines))
+    clusterIds = clusterOrder[inverse]
+
+    clusterOffsets = np.concatenate([[0], np.cumsum(np.bincount(clusterIds, minlength=len(firstLines)))])
+    clusters = CSRToLists(clusterOffsets, np.argsort(clusterIds, kind="stable"))
 
     return clusters
 
@@ -1,4 +1,4 @@
-from PySide6.QtWidgets import QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLineEdit, QFileDialog, QLabel, QComboBox, QApplication, QScrollArea
+from PySide6.QtWidgets import QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLineEdit, QFileDialog, QLabel, QComboBox, QApplication, QScrollArea, QMessageBox
 from PySide6.QtGui import QPixmap, QColor
 from PySide6.QtCore import Qt, Signal
 
@@ -16,7 +16,13 @@ from source.Helpers.HelperFunctions import draw_lines_on_pixmap, ArrayToPixmap,
 from source.UIElements.ClickableLabel import ClickableLabel
 from source.UIElements.SliderLineEditCombo import SliderLineEditCombo
 from source.UIElements.ProgressBar import ProgressBarPopup
-from source.Helpers.CreateSkeleton import GenerateSkeleton
+from source.Helpers.CreateSkeleton import fullPrecision, reducedPrecision
+from source.Helpers.BatchEngine import SkeletonJobSettings, SkeletonBatch
+from source.Helpers.SkeletonBatchThread import SkeletonBatchThread
+from source.Helpers.RunJournal import RunJournal, RunJournalPath, SettingsFromJSON
+from source.Helpers.ResultStore import CalculationsPath, CalculationsBaseName, IsCalculationsFile, LoadCalculations, CalculationsCache
+from source.Helpers.StepCache import StepCache
+from source.Helpers.ImageLoader import LoadNormalizedImage, imageCache
 from source.Helpers.CSVCreator import GenerateCSVs
 import copy
 
@@ -56,6 +62,11 @@ class ImageOverview(QWidget):
 		self.createdSkeletons = False
 		self.skeletonUIAdded = False
 
+		#skeleton generation running in the background
+		self.batchThread:SkeletonBatchThread = None
+		self.batchProgressBar:ProgressBarPopup = None
+		self.batchFinishedCallback = None
+
 		self.defaultInputDirectory = ""
 		self.defaultOutputDirectory = ""
 
@@ -68,6 +79,27 @@ class ImageOverview(QWidget):
 
 		self.currentSkeletonsOverlayed = set()
 
+		#intermediate images of every pipeline step, reused when only later steps change
+		self.stepCacheDirectory = os.path.join(self.workingDirectory, "StepCache")
+		self.stepCacheSizeMB = 2048
+
+		#decoded input images kept in memory for switching between images and overlays
+		self.imageCacheSizeMB = 512
+
+		#float32 grayscale images and bool masks between pipeline steps instead of float64
+		self.reducedPrecision = False
+
+		#worker processes for generating skeletons, 0 uses every core
+		self.batchWorkers = 0
+		self.threadsPerWorker = 1
+
+		#calculations are saved as binary result stores, optionally with the JSON files as well
+		self.compressResults = True
+		self.exportCalculationsJSON = False
+
+		#loaded calculations files kept in memory for switching between images and overlays
+		self.calculationsCacheSize = 32
+
 		self.sampleToFiles = {}
 		self.currentFileList = []
 
@@ -76,6 +108,10 @@ class ImageOverview(QWidget):
 		else:
 			self.CreateInitializationSettings()
 
+		self.stepCache = StepCache(self.stepCacheDirectory, self.stepCacheSizeMB * 1024 * 1024)
+		imageCache.SetMaxBytes(self.imageCacheSizeMB * 1024 * 1024)
+		self.calculationsCache = CalculationsCache(self.calculationsCacheSize)
+
 		self.CreateUI()
 
 	def CreateUI(self):
@@ -118,6 +154,10 @@ class ImageOverview(QWidget):
 		generateSkeletonsButton.clicked.connect(self.GenerateSkeletons)
 		layout.addWidget(generateSkeletonsButton)
 
+		resumeRunButton = QPushButton("Resume Last Run")
+		resumeRunButton.clicked.connect(self.ResumeLastRun)
+		layout.addWidget(resumeRunButton)
+
 		self.generateIndividualSkeletonButton = QPushButton("Generate Single Skeleton")
 		self.generateIndividualSkeletonButton.clicked.connect(self.GenerateSingleSkeleton)
 		layout.addWidget(self.generateIndividualSkeletonButton)
@@ -176,22 +216,19 @@ class ImageOverview(QWidget):
 
 		for fileName in os.listdir(os.path.join(self.defaultOutputDirectory, "Calculations")):
 			#get calculations file
-			if fileName.endswith("_calculations.json"):
+			if IsCalculationsFile(fileName):
 				#load calculations file
-				currentCalculationsFile = open(os.path.join(self.defaultOutputDirectory, "Calculations", fileName), "r")
-				currentCalculations:dict = json.load(currentCalculationsFile)
-				currentCalculationsFile.close()
+				calculationsFilePath = os.path.join(self.defaultOutputDirectory, "Calculations", fileName)
+				currentCalculations:dict = LoadCalculations(calculationsFilePath)
 
 				#switch name
 				if oldKey in currentCalculations:
 					currentCalculations[newKey] = currentCalculations.pop(oldKey)
 
 					#save calculations file
-					writeCalculationsFile = open(os.path.join(self.defaultOutputDirectory, "Calculations", fileName), "w")
-					json.dump(currentCalculations, writeCalculationsFile, indent=4)
-					writeCalculationsFile.close()
+					self.calculationsCache.Save(currentCalculations, calculationsFilePath, self.compressResults, self.exportCalculationsJSON)
 
-				baseInputFileName = fileName.replace("_calculations.json", "")
+				baseInputFileName = CalculationsBaseName(fileName)
 
 				GenerateCSVs(currentCalculations, baseInputFileName, self.defaultOutputDirectory)
 			elif fileName.endswith("csvs"):
@@ -234,49 +271,68 @@ class ImageOverview(QWidget):
 		if not os.path.exists(os.path.join(self.defaultOutputDirectory, "Calculations")):
 			os.makedirs(os.path.join(self.defaultOutputDirectory, "Calculations"))
 
-	def CreateSkeleton(self, fileName:str, sample:str) -> None:
-		jsonResult = {}
-		
-		jsonResult[originalImageKey] = os.path.join(self.defaultInputDirectory, fileName)
-
-		#save skeleton image file
-		baseFileName, extension = os.path.splitext(fileName)
-		
-		#save JSON file for image
-		fileNameSplit:list[str] = os.path.splitext(fileName)[0].split("_")
-		timestamp = int(fileNameSplit[-1])
-
-		jsonResult[timestampKey] = timestamp
-		jsonResult[sampleKey] = sample
-		
-		#get result from skeleton creator
+	def GetJobSettings(self) -> SkeletonJobSettings:
+		pipelines = {}
 		for currSkeletonKey in self.skeletonPipelines:
-			#create parameters
 			parameters = self.skeletonDisplayRegion.GetParameterValues(currSkeletonKey)
+			pipelines[currSkeletonKey] = (parameters, self.skeletonPipelines[currSkeletonKey]["steps"])
+
+		precision = reducedPrecision if self.reducedPrecision else fullPrecision
+
+		return SkeletonJobSettings(self.defaultInputDirectory, self.defaultOutputDirectory, pipelines, self.pipelineSteps,
+							 self.stepCacheDirectory, self.stepCacheSizeMB * 1024 * 1024, precision,
+							 self.compressResults, self.exportCalculationsJSON)
+
+	def IsGeneratingSkeletons(self) -> bool:
+		return self.batchThread is not None and self.batchThread.isRunning()
+
+	def CreateSkeletonsInBatch(self, jobs:list[tuple[str, str]], onFinished, settings:SkeletonJobSettings=None, journal:RunJournal=None) -> None:
+		#jobs are (file name, sample) pairs, run on a background thread so the UI stays responsive
+		#onFinished is called on the UI thread once every job is done or the batch is cancelled
+		if settings is None:
+			settings = self.GetJobSettings()
+
+		batch = SkeletonBatch(settings, jobs, self.batchWorkers, self.threadsPerWorker, self.stepCache, journal)
+
+		self.batchFinishedCallback = onFinished
+		self.batchProgressBar = ProgressBarPopup(maximum=len(jobs), cancellable=True)
+		self.batchThread = SkeletonBatchThread(batch)
 
-			skeletonResult = GenerateSkeleton(self.defaultInputDirectory, fileName, parameters, self.skeletonPipelines[currSkeletonKey]["steps"], self.pipelineSteps)
+		self.batchProgressBar.Cancelled.connect(self.batchThread.Cancel)
+		self.batchThread.ImageFinished.connect(self.BatchImageFinished)
+		self.batchThread.BatchFinished.connect(self.BatchFinished)
 
-			newBaseFileName = baseFileName + "_" + currSkeletonKey
-			newFileName = newBaseFileName + extension
+		self.batchProgressBar.show()
+		self.batchThread.start()
 
-			imgArray = skeletonResult[skeletonKey]
-			img = Image.fromarray(np.asarray(imgArray * 255, dtype=np.uint8), mode="L")
-			img = img.convert("RGB")
-			img.save(os.path.join(self.defaultOutputDirectory, newFileName))
+	def BatchImageFinished(self, fileName:str, error:str) -> None:
+		if error != "":
+			print(f"Failed to create skeletons for {fileName}: {error}")
 
-			skeletonResult[skeletonKey] = os.path.join(self.defaultOutputDirectory, newFileName)
+		batch = self.batchThread.batch
+		self.batchProgressBar.update_stats(batch.completed + batch.failed, batch.ElapsedTime())
+		self.batchProgressBar.increment()
 
-			skeletonResult["lineComments"] = {}
-			skeletonResult["clusterComments"] = {}
+	def BatchFinished(self) -> None:
+		batch = self.batchThread.batch
+		self.batchThread.wait()
 
-			jsonResult[currSkeletonKey] = skeletonResult
+		self.batchProgressBar.close_popup()
 
-		GenerateCSVs(jsonResult, baseFileName, self.defaultOutputDirectory)
+		cancelledText = f", {batch.Remaining()} cancelled" if batch.cancelled else ""
+		print(f"Created skeletons for {batch.completed} images in {batch.ElapsedTime():.2f} seconds ({batch.ImagesPerSecond():.2f} images/s, {batch.maxWorkers} workers), {batch.upToDate} already up to date, {batch.failed} failed{cancelledText}")
 
-		jsonFilePath = os.path.join(self.outputDirLineEdit.text(), "Calculations", baseFileName + "_calculations.json")
-		jsonFile = open(jsonFilePath, "w")
-		json.dump(jsonResult, jsonFile, indent=4)
-		jsonFile.close()
+		onFinished = self.batchFinishedCallback
+
+		self.batchThread = None
+		self.batchProgressBar = None
+		self.batchFinishedCallback = None
+
+		#nothing to show if the run was cancelled or failed before any image was saved
+		if batch.completed == 0:
+			return
+
+		onFinished()
 
 	def UpdateComments(self, currSkeletonKey:str, lineIndex:int, lineComments:str, clusterIndex:int, clusterComments:str) -> None:
 		calculations = self.GetCurrentCalculations()
@@ -286,70 +342,104 @@ class ImageOverview(QWidget):
 
 		calculationsFilePath = self.GetCurrentCalculationsFile()
 
-		jsonFile = open(calculationsFilePath, "w")
-		json.dump(calculations, jsonFile, indent=4)
-		jsonFile.close()
+		self.calculationsCache.Save(calculations, calculationsFilePath, self.compressResults, self.exportCalculationsJSON)
 
 	def GenerateSingleSkeleton(self) -> None:
-		self.ReadDirectories()
-
-		progressBar = ProgressBarPopup(maximum=2)
-		progressBar.increment()
-		progressBar.show()
-		QApplication.processEvents()
-
-		self.CreateSkeleton(self.currentFileList[self.currentIndex], self.currentSample)
+		if self.IsGeneratingSkeletons():
+			return
 
-		progressBar.increment()
-		QApplication.processEvents()
+		self.ReadDirectories()
 
-		self.LoadImageIntoUI(self.currentIndex)
+		self.CreateSkeletonsInBatch([(self.currentFileList[self.currentIndex], self.currentSample)], self.ReloadCurrentImage)
 
 	def GenerateSampleSkeletons(self) -> None:
+		if self.IsGeneratingSkeletons():
+			return
+
 		self.ReadDirectories()
 
-		progressBar = ProgressBarPopup(maximum=len(self.sampleToFiles[self.currentSample]))
-		progressBar.show()
-		QApplication.processEvents()
+		jobs = [(fileName, self.currentSample) for fileName in self.sampleToFiles[self.currentSample]]
 
-		for fileName in self.sampleToFiles[self.currentSample]:
-			self.CreateSkeleton(fileName, self.currentSample)
-			progressBar.increment()
-			QApplication.processEvents()
+		#not journaled, that would replace the journal of an unfinished full run
+		self.CreateSkeletonsInBatch(jobs, self.ReloadCurrentImage)
 
-		self.LoadImageIntoUI(self.currentIndex)
+	def ReloadCurrentImage(self) -> None:
+		if self.HasResults(self.currentFileList, self.currentIndex):
+			self.LoadImageIntoUI(self.currentIndex)
+		else:
+			self.LoadFirstImageWithResults()
 
 	def GenerateSkeletons(self) -> None:
-		self.createdSkeletons = True
-		
-		self.ReadDirectories()
+		if self.IsGeneratingSkeletons():
+			return
 
-		startTime = time.time()
+		self.ReadDirectories()
 
-		totalFiles = 0
-		for sample in self.sampleToFiles:
-			totalFiles += len(self.sampleToFiles[sample])
+		if not self.ConfirmReplacingUnfinishedRun():
+			return
 
-		progressBar = ProgressBarPopup(maximum=totalFiles)
-		progressBar.show()
-		QApplication.processEvents()
+		self.createdSkeletons = True
 
 		#loop through samples/files
+		jobs = []
 		for sample in self.sampleToFiles:
 			for fileName in self.sampleToFiles[sample]:
-				self.CreateSkeleton(fileName, sample)
-				progressBar.increment()
-				QApplication.processEvents()
+				jobs.append((fileName, sample))
 
-		endTime = time.time()
-		print(f"Total Time Taken: {endTime - startTime} seconds")
+		settings, journal = self.StartRunJournal(jobs)
 
-		#add skeleton UI
-		self.AddSkeletonUI()
+		#add skeleton UI once the batch is done
+		self.CreateSkeletonsInBatch(jobs, self.AddSkeletonUI, settings, journal)
+
+	def ConfirmReplacingUnfinishedRun(self) -> bool:
+		#starting a run replaces the journal, so an unfinished run couldn't be resumed anymore
+		state = RunJournal(RunJournalPath(self.defaultOutputDirectory)).Load()
+
+		if state is None or state.finished:
+			return True
+
+		answer = QMessageBox.question(self, "Unfinished Run",
+								"The last run in this output directory didn't finish and can still be resumed. Start a new run and discard it?",
+								QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+
+		return answer == QMessageBox.StandardButton.Yes
+
+	def StartRunJournal(self, jobs:list[tuple[str, str]]) -> tuple[SkeletonJobSettings, RunJournal]:
+		#full runs are journaled so they can be resumed if the app stops partway through
+		settings = self.GetJobSettings()
+
+		journal = RunJournal(RunJournalPath(self.defaultOutputDirectory))
+		journal.Start(settings, jobs)
+
+		return settings, journal
+
+	def ResumeLastRun(self) -> None:
+		if self.IsGeneratingSkeletons():
+			return
+
+		self.ReadDirectories()
+
+		journal = RunJournal(RunJournalPath(self.defaultOutputDirectory))
+		state = journal.Load()
+
+		if state is None or state.finished:
+			print("No unfinished run to resume in " + self.defaultOutputDirectory)
+			return
+
+		#the run continues with the settings it started with, not the current sliders
+		settings = SettingsFromJSON(state.settingsData, self.stepCacheDirectory, self.stepCacheSizeMB * 1024 * 1024)
+		jobs = state.RemainingJobs()
+
+		print(f"Resuming run with {len(jobs)} of {len(state.jobs)} images left")
+
+		self.createdSkeletons = True
+
+		journal.Reopen()
+		self.CreateSkeletonsInBatch(jobs, self.AddSkeletonUI, settings, journal)
 
 	def AddSkeletonUI(self) -> None:
 		if self.skeletonUIAdded:
-			self.LoadImageIntoUI(0)
+			self.LoadFirstImageWithResults()
 			return
 		
 		self.skeletonUIAdded = True
@@ -405,44 +495,64 @@ class ImageOverview(QWidget):
 		self.skeletonDisplayRegion.ToggleOverlay.connect(self.ToggleOverlay)
 		self.skeletonDisplayRegion.CompareToExternalSkeleton.connect(self.CompareToExternalSkeleton)
 
-		self.LoadNewSample(list(self.sampleToFiles.keys())[0])
+		self.LoadFirstImageWithResults()
 
 	def CompareToExternalSkeleton(self, currSkeletonKey:str) -> None:
 		self.CompareToExternal.emit(currSkeletonKey)
 
+	def GetCalculationsFile(self, imageFileName:str) -> str:
+		return CalculationsPath(os.path.join(self.defaultOutputDirectory, "Calculations"), os.path.splitext(imageFileName)[0])
+
 	def GetCurrentCalculationsFile(self) -> str:
-		imageFileName = self.currentFileList[self.currentIndex]
+		return self.GetCalculationsFile(self.currentFileList[self.currentIndex])
+
+	def HasResults(self, fileList:list[str], index:int) -> bool:
+		#a cancelled or failed run leaves some images without calculations
+		return 0 <= index < len(fileList) and os.path.exists(self.GetCalculationsFile(fileList[index]))
+
+	def FindImageWithResults(self, fileList:list[str], startIndex:int, direction:int=1) -> int:
+		#index of the first image from startIndex on (or back, if direction is -1) that has results, -1 if there's none
+		index = startIndex
+		while 0 <= index < len(fileList):
+			if self.HasResults(fileList, index):
+				return index
+
+			index += direction
+
+		return -1
+
+	def LoadFirstImageWithResults(self) -> None:
+		for sample in self.sampleToFiles:
+			if self.FindImageWithResults(self.sampleToFiles[sample], 0) < 0:
+				continue
+
+			#LoadNewSample is called below, not through the dropdown's signal
+			self.sampleDropdown.blockSignals(True)
+			self.sampleDropdown.setCurrentText(sample)
+			self.sampleDropdown.blockSignals(False)
 
-		#load calculation file
-		calculationFileName = os.path.splitext(imageFileName)[0] + "_calculations.json"
-		calculationFilePath = os.path.join(self.defaultOutputDirectory, "Calculations", calculationFileName)
-	
-		return calculationFilePath
+			self.LoadNewSample(sample)
+			return
+
+		print("No skeletons have been created in " + self.defaultOutputDirectory)
 
-	def GetCurrentCalculations(self) -> dict:
+	def GetCurrentCalculations(self, pipelineKeys:list[str]=None) -> dict:
+		#only loads pipelineKeys (every pipeline if None), the other pipelines are left out
 		calculationFilePath = self.GetCurrentCalculationsFile()
 
-		calculationFile = open(calculationFilePath, "r")
-		calculations = json.load(calculationFile)
-		calculationFile.close()
+		#shared with the cache, changes must be saved through self.calculationsCache
+		calculations = self.calculationsCache.Get(calculationFilePath, pipelineKeys)
 
 		return calculations
 
 	def ToggleOverlay(self, currSkeletonKey:str) -> None:
 		imageFileName = self.currentFileList[self.currentIndex]
-		calculations = self.GetCurrentCalculations()
+		calculations = self.GetCurrentCalculations([currSkeletonKey])
 		
 		if not currSkeletonKey in self.currentSkeletonsOverlayed:
 			self.currentSkeletonsOverlayed.add(currSkeletonKey)
 			
-			originalImage = Image.open(os.path.join(self.defaultInputDirectory, imageFileName))
-			originalImageArray = np.asarray(originalImage, dtype=np.float64).copy()
-
-			maxValue = np.max(originalImageArray)
-			minValue = np.min(originalImageArray)
-			originalImageArray -= minValue
-			maxValue -= minValue
-			originalImageArray /= maxValue
+			originalImageArray = LoadNormalizedImage(os.path.join(self.defaultInputDirectory, imageFileName))
 
 			originalImagePixmap = ArrayToPixmap(originalImageArray, self.imageSize, False)
 
@@ -466,11 +576,17 @@ class ImageOverview(QWidget):
 		self.TriggerPreview.emit(currImagePath, currSkeletonKey)
 
 	def LoadNewSample(self, value:str) -> None:
+		firstIndex = self.FindImageWithResults(self.sampleToFiles[value], 0)
+
+		if firstIndex < 0:
+			print(f"No skeletons have been created for {value}")
+			return
+
 		self.currentFileList = self.sampleToFiles[value]
 
 		self.currentSample = value
 
-		self.LoadImageIntoUI(0)
+		self.LoadImageIntoUI(firstIndex)
 
 	def GoIntoSkeletonView(self, currSkeletonKey:str) -> None:
 		self.ClickedOnSkeleton.emit(self.currentFileList[self.currentIndex], currSkeletonKey)
@@ -482,18 +598,12 @@ class ImageOverview(QWidget):
 
 		imageFileName = self.currentFileList[index]
 
-		calculations = self.GetCurrentCalculations()
+		#pipelines that were removed since the file was saved aren't loaded
+		calculations = self.GetCurrentCalculations(list(self.skeletonPipelines))
 
 		self.timestampLabel.setText(f"Timestamp: {calculations[timestampKey]}")
 
-		originalImage = Image.open(os.path.join(self.defaultInputDirectory, imageFileName))
-		originalImageArray = np.asarray(originalImage, dtype=np.float64).copy()
-
-		maxValue = np.max(originalImageArray)
-		minValue = np.min(originalImageArray)
-		originalImageArray -= minValue
-		maxValue -= minValue
-		originalImageArray /= maxValue
+		originalImageArray = LoadNormalizedImage(os.path.join(self.defaultInputDirectory, imageFileName))
 
 		originalImagePixmap = ArrayToPixmap(originalImageArray, self.imageSize, False)
 
@@ -513,10 +623,13 @@ class ImageOverview(QWidget):
 		self.skeletonDisplayRegion.SetParameterValues(values)
 
 	def ChangeIndex(self, direction:int) -> None:
-		if self.currentIndex + direction < 0 or self.currentIndex + direction >= len(self.currentFileList):
+		#images without results are skipped
+		newIndex = self.FindImageWithResults(self.currentFileList, self.currentIndex + direction, direction)
+
+		if newIndex < 0:
 			return
 		
-		self.LoadImageIntoUI(self.currentIndex + direction)
+		self.LoadImageIntoUI(newIndex)
 
 		if self.currentIndex == 0:
 			self.leftButton.setEnabled(False)
@@ -555,7 +668,16 @@ class ImageOverview(QWidget):
 		
 		initializationSettings = {
 			"defaultInputDirectory": self.defaultInputDirectory,
-			"defaultOutputDirectory": self.defaultOutputDirectory
+			"defaultOutputDirectory": self.defaultOutputDirectory,
+			"stepCacheDirectory": self.stepCacheDirectory,
+			"stepCacheSizeMB": self.stepCacheSizeMB,
+			"imageCacheSizeMB": self.imageCacheSizeMB,
+			"reducedPrecision": self.reducedPrecision,
+			"batchWorkers": self.batchWorkers,
+			"threadsPerWorker": self.threadsPerWorker,
+			"compressResults": self.compressResults,
+			"exportCalculationsJSON": self.exportCalculationsJSON,
+			"calculationsCacheSize": self.calculationsCacheSize
 		}
 
 		initFile = open(self.initSettingsFilePath, "w")
@@ -584,4 +706,15 @@ class ImageOverview(QWidget):
 		initFile.close()
 
 		self.defaultInputDirectory = initSettings["defaultInputDirectory"]
-		self.defaultOutputDirectory = initSettings["defaultOutputDirectory"]
\ No newline at end of file
+		self.defaultOutputDirectory = initSettings["defaultOutputDirectory"]
+
+		#settings files from older versions don't have the cache settings
+		self.stepCacheDirectory = initSettings.get("stepCacheDirectory", self.stepCacheDirectory)
+		self.stepCacheSizeMB = initSettings.get("stepCacheSizeMB", self.stepCacheSizeMB)
+		self.imageCacheSizeMB = initSettings.get("imageCacheSizeMB", self.imageCacheSizeMB)
+		self.reducedPrecision = initSettings.get("reducedPrecision", self.reducedPrecision)
+		self.batchWorkers = initSettings.get("batchWorkers", self.batchWorkers)
+		self.threadsPerWorker = initSettings.get("threadsPerWorker", self.threadsPerWorker)
+		self.compressResults = initSettings.get("compressResults", self.compressResults)
+		self.exportCalculationsJSON = initSettings.get("exportCalculationsJSON", self.exportCalculationsJSON)
+		self.calculationsCacheSize = initSettings.get("calculationsCacheSize", self.calculationsCacheSize)
\ No newline at end of file
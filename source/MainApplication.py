@@ -154,7 +154,7 @@ class MainApplication(QWidget):
         self.primaryLayout.setCurrentWidget(self.skeletonViewer)
 
     def GoIntoComparison(self, currSkeletonKey:str) -> None:
-        self.comparisonWindow.SetImage(self.overview.GetCurrentCalculations(), currSkeletonKey)
+        self.comparisonWindow.SetImage(self.overview.GetCurrentCalculations([currSkeletonKey]), currSkeletonKey)
         self.primaryLayout.setCurrentWidget(self.comparisonWindow)
 
     def BackToOverview(self) -> None:
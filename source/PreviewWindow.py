@@ -11,7 +11,8 @@ import json
 
 from PIL import Image
 
-from source.Helpers.HelperFunctions import ArrayToPixmap, NormalizeImageArray
+from source.Helpers.HelperFunctions import ArrayToPixmap
+from source.Helpers.ImageLoader import LoadNormalizedImage
 
 from source.UIElements.SkeletonPipelineParameterSliders import SkeletonPipelineParameterSliders
 
@@ -143,9 +144,7 @@ class PreviewWindow(QWidget):
 
 		self.AddParameterSliders(parameterValues)
 
-		origImg = Image.open(imagePath)
-		self.originalImageArray = np.asarray(origImg, dtype=np.float64)
-		self.originalImageArray = NormalizeImageArray(self.originalImageArray)
+		self.originalImageArray = LoadNormalizedImage(imagePath, grayscale=True)
 		origImgPixmap = ArrayToPixmap(self.originalImageArray, self.imageResolution)
 		self.mainImageLabel.setPixmap(origImgPixmap)
 
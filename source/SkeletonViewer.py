@@ -8,6 +8,7 @@ import os
 import numpy as np
 
 from source.Helpers.HelperFunctions import camel_case_to_capitalized, ArrayToPixmap, originalImageKey, statFunctionMap, vectorKey, pointsKey, linesKey, clusterKey, functionTypeKey, imageTypeKey, clusterTypeKey, lineTypeKey
+from source.Helpers.ImageLoader import LoadNormalizedImage
 from source.UIElements.InteractiveSkeletonPixmap import InteractiveSkeletonPixmap
 from source.UIElements.CustomTextEdit import CustomTextEdit
 
@@ -224,14 +225,7 @@ class SkeletonViewer(QWidget):
 
         self.currentSkeletonKey = currSkeletonKey
 
-        originalImage = Image.open(self.currentResults[originalImageKey])
-        originalImageArray = np.asarray(originalImage, dtype=np.float64).copy()
-
-        maxValue = np.max(originalImageArray)
-        minValue = np.min(originalImageArray)
-        originalImageArray -= minValue
-        maxValue -= minValue
-        originalImageArray /= maxValue
+        originalImageArray = LoadNormalizedImage(self.currentResults[originalImageKey])
 
         originalImagePixmap = ArrayToPixmap(originalImageArray, self.imageResolution, False)
         self.skeletonLabel.SetLines(self.currentResults[currSkeletonKey][vectorKey][pointsKey], 
@@ -2,9 +2,11 @@ from PySide6.QtWidgets import QLabel
 from PySide6.QtCore import Signal, QRect, Qt
 from PySide6.QtGui import QMouseEvent, QColor
 
-import math
+import numpy as np
 
-from source.Helpers.HelperFunctions import draw_lines_on_pixmap, DistanceToLine
+from source.Helpers.HelperFunctions import draw_lines_on_pixmap
+from source.Helpers.SkeletonGraph import SkeletonGraph
+from source.Helpers.GeometryContext import GeometryContext
 
 class InteractiveSkeletonPixmap(QLabel):
     #line length, cluster length, line index, cluster index
@@ -25,6 +27,9 @@ class InteractiveSkeletonPixmap(QLabel):
         self.points = None
         self.lines = None
         self.clusters = None
+        self.context:GeometryContext = None
+        self.graph:SkeletonGraph = None
+        self.segmentLines:np.ndarray = None
 
         self.hoveredLineIndex = None
         self.hoveredClumpIndex = None
@@ -44,14 +49,14 @@ class InteractiveSkeletonPixmap(QLabel):
         self.lines = lines
         self.clusters = clusters
 
+        self.context = GeometryContext(None, None, lines, points, clusters)
+        self.graph = self.context.graph
+        _, _, self.segmentLines = self.context.segments
+
         self.UpdateLines()
 
     def LineToClump(self, line:int) -> int:
-        for i in range(len(self.clusters)):
-            if line in self.clusters[i]:
-                return i
-            
-        return -1
+        return int(self.context.lineClusters[line])
     
     def GetColorMap(self) -> dict:
         if self.hoveredClumpIndex is None and self.hoveredLineIndex is None \
@@ -72,20 +77,9 @@ class InteractiveSkeletonPixmap(QLabel):
 
         return result
     
-    def PointDistance(self, point1:tuple[float, float], point2:tuple[float, float]) -> float:
-        return math.sqrt(pow(point2[0] - point1[0], 2) + pow(point2[1] - point1[1], 2))
-
     def EmitLineData(self) -> None:
-        selectedLineLength = 0.0
-        for i in range(len(self.lines[self.selectedLineIndex]) - 1):
-            selectedLineLength += self.PointDistance(self.points[self.lines[self.selectedLineIndex][i]], self.points[self.lines[self.selectedLineIndex][i + 1]])
-
-        selectedClumpLength = 0.0
-        for i in range(len(self.clusters[self.selectedClumpIndex])):
-            lineIndex = self.clusters[self.selectedClumpIndex][i]
-
-            for j in range(len(self.lines[lineIndex]) - 1):
-                selectedClumpLength += self.PointDistance(self.points[self.lines[lineIndex][j]], self.points[self.lines[lineIndex][j + 1]])
+        selectedLineLength = float(self.context.lineLengths[self.selectedLineIndex])
+        selectedClumpLength = float(self.context.clusterLengths[self.selectedClumpIndex])
 
         self.UpdateLineData.emit(selectedLineLength, selectedClumpLength, self.selectedLineIndex, self.selectedClumpIndex)
 
@@ -150,16 +144,12 @@ class InteractiveSkeletonPixmap(QLabel):
         closestLine = -1
         closestDist = float("inf")
 
-        for i in range(len(self.lines)):
-            for j in range(len(self.lines[i]) - 1):
-                startPoint = self.points[self.lines[i][j]]
-                endPoint = self.points[self.lines[i][j + 1]]
-
-                dist = DistanceToLine((x, y), startPoint, endPoint)
+        segmentDistances = self.graph.SegmentDistances((x, y))
 
-                if dist < closestDist:
-                    closestDist = dist
-                    closestLine = i
+        if len(segmentDistances) > 0:
+            closestSegment = int(np.argmin(segmentDistances))
+            closestDist = segmentDistances[closestSegment]
+            closestLine = int(self.segmentLines[closestSegment])
 
         if closestDist < self.maxSelectDistance:
             if closestLine != self.hoveredLineIndex:
@@ -191,5 +181,5 @@ class InteractiveSkeletonPixmap(QLabel):
 
     def UpdateLines(self) -> None:
         colorMap = self.GetColorMap()
-        pixmap = draw_lines_on_pixmap(self.points, self.lines, self.dimension, colorMap)
+        pixmap = draw_lines_on_pixmap(self.points, self.lines, self.dimension, colorMap, graph=self.graph)
         self.setPixmap(pixmap)
\ No newline at end of file
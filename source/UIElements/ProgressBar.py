@@ -1,14 +1,16 @@
 from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QProgressBar, QLabel
+    QWidget, QVBoxLayout, QProgressBar, QLabel, QPushButton
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
 
 
 class ProgressBarPopup(QWidget):
-    def __init__(self, title="Progress", message="Processing...", maximum=100):
+    Cancelled = Signal()
+
+    def __init__(self, title="Progress", message="Processing...", maximum=100, cancellable=False):
         super().__init__()
         self.setWindowTitle(title)
-        self.setFixedSize(200, 100)
+        self.setFixedSize(260, 150 if cancellable else 100)
 
         self.myLayout = QVBoxLayout()
         self.label = QLabel(message)
@@ -16,6 +18,21 @@ class ProgressBarPopup(QWidget):
 
         self.myLayout.addWidget(self.label)
         self.myLayout.addWidget(self.progress_bar)
+
+        #throughput and estimated time remaining, filled in by update_stats
+        self.stats_label = QLabel("")
+        self.myLayout.addWidget(self.stats_label)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel)
+        self.cancel_button.setVisible(cancellable)
+        self.myLayout.addWidget(self.cancel_button)
+
+        self.cancellable = cancellable
+
+        #set when the work is done, so closing the popup then isn't a cancel
+        self.finished = False
+
         self.setLayout(self.myLayout)
 
         self.progress_bar.setRange(0, maximum)
@@ -35,5 +52,30 @@ class ProgressBarPopup(QWidget):
         new_value = current + step
         self.update_progress(new_value)
 
+    def update_stats(self, completed: int, elapsed_seconds: float):
+        if completed <= 0 or elapsed_seconds <= 0:
+            return
+
+        rate = completed / elapsed_seconds
+        remaining = max(self.progress_bar.maximum() - completed, 0)
+        remaining_seconds = int(round(remaining / rate))
+
+        minutes, seconds = divmod(remaining_seconds, 60)
+        self.stats_label.setText(f"{rate:.2f} images/s, about {minutes}:{seconds:02d} left")
+
+    def cancel(self):
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setText("Cancelling...")
+        self.label.setText("Finishing images in progress...")
+        self.Cancelled.emit()
+
+    def closeEvent(self, event):
+        #closing the window while the work is running cancels it, the same as the cancel button
+        if self.cancellable and not self.finished and self.cancel_button.isEnabled():
+            self.cancel()
+
+        super().closeEvent(event)
+
     def close_popup(self):
-        self.close()
\ No newline at end of file
+        self.finished = True
+        self.close()
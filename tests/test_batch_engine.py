@@ -0,0 +1,150 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from PIL import Image
+
+from source.Helpers.BatchEngine import SkeletonJobSettings, CreateSkeletonFiles, PipelineFingerprint
+from source.Helpers.HelperFunctions import fingerprintKey
+from source.Helpers.ResultStore import LoadCalculations, SaveResultStore, calculationsStoreSuffix, calculationsJSONSuffix
+
+configDirectory = os.path.join(os.path.dirname(__file__), "..", "configs")
+imageFileName = "plate_100.png"
+
+def LoadConfig(fileName:str) -> dict:
+    with open(os.path.join(configDirectory, fileName), "r") as configFile:
+        return json.load(configFile)
+
+def DefaultPipelines() -> tuple[dict, dict]:
+    #every pipeline in the repo's config with its default parameters
+    skeletonPipelines = LoadConfig("SkeletonPipelines.json")
+    pipelineSteps = LoadConfig("PipelineSteps.json")
+    stepParameters = LoadConfig("StepParameters.json")
+
+    pipelines = {}
+    for pipelineKey, pipeline in skeletonPipelines.items():
+        parameters = [{parameterKey: stepParameters[parameterKey]["default"] for parameterKey in pipelineSteps[step]["relatedParameters"]} for step in pipeline["steps"]]
+        pipelines[pipelineKey] = (parameters, pipeline["steps"])
+
+    return pipelines, pipelineSteps
+
+def WriteTestImage(directory:str) -> None:
+    #bright crossing lines over a noisy background
+    generator = np.random.default_rng(0)
+    image = generator.uniform(0, 40, (128, 128))
+    image[60:66, 10:118] = 255
+    image[10:118, 30:35] = 255
+    image[20:100, 90:94] = 220
+
+    Image.fromarray(image.astype(np.uint8), mode="L").save(os.path.join(directory, imageFileName))
+
+@pytest.fixture
+def settings(tmp_path) -> SkeletonJobSettings:
+    inputDirectory = tmp_path / "Images"
+    outputDirectory = tmp_path / "Skeletons"
+    inputDirectory.mkdir()
+    outputDirectory.mkdir()
+
+    WriteTestImage(str(inputDirectory))
+    pipelines, pipelineSteps = DefaultPipelines()
+
+    return SkeletonJobSettings(str(inputDirectory), str(outputDirectory), pipelines, pipelineSteps, statWorkers=1)
+
+def StorePath(settings:SkeletonJobSettings) -> str:
+    return os.path.join(settings.outputDirectory, "Calculations", os.path.splitext(imageFileName)[0] + calculationsStoreSuffix)
+
+def JSONPath(settings:SkeletonJobSettings) -> str:
+    return os.path.join(settings.outputDirectory, "Calculations", os.path.splitext(imageFileName)[0] + calculationsJSONSuffix)
+
+def test_first_run_creates_every_pipeline(settings):
+    updatedPipelines = CreateSkeletonFiles(settings, imageFileName, "plate")
+
+    assert sorted(updatedPipelines) == sorted(settings.pipelines)
+
+    calculations = LoadCalculations(StorePath(settings))
+    for pipelineKey in settings.pipelines:
+        assert os.path.exists(calculations[pipelineKey]["skeleton"])
+        assert calculations[pipelineKey][fingerprintKey] == PipelineFingerprint(os.path.join(settings.inputDirectory, imageFileName), *settings.pipelines[pipelineKey], settings.pipelineSteps, settings.precision)
+
+def test_current_results_are_skipped(settings):
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+    storeState = os.stat(StorePath(settings)).st_mtime_ns
+
+    assert CreateSkeletonFiles(settings, imageFileName, "plate") == []
+    assert os.stat(StorePath(settings)).st_mtime_ns == storeState
+
+def test_changed_parameters_only_rerun_that_pipeline(settings):
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+
+    #a different value for the first parameter of the first pipeline's last step
+    pipelineKey = next(iter(settings.pipelines))
+    parameters, steps = settings.pipelines[pipelineKey]
+    changedParameters = [dict(stepParameters) for stepParameters in parameters]
+    parameterKey = next(iter(changedParameters[-1]))
+    changedParameters[-1][parameterKey] += 1
+
+    settings.pipelines[pipelineKey] = (changedParameters, steps)
+
+    assert CreateSkeletonFiles(settings, imageFileName, "plate") == [pipelineKey]
+
+def test_edited_input_reruns_every_pipeline(settings):
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+
+    #a newer modification time changes the fingerprint even if the contents are the same
+    inputPath = os.path.join(settings.inputDirectory, imageFileName)
+    newTime = os.stat(inputPath).st_mtime_ns + 10**9
+    os.utime(inputPath, ns=(newTime, newTime))
+
+    assert sorted(CreateSkeletonFiles(settings, imageFileName, "plate")) == sorted(settings.pipelines)
+
+def test_comments_are_kept_for_current_pipelines(settings):
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+
+    calculations = LoadCalculations(StorePath(settings))
+    keptPipeline, rerunPipeline = list(settings.pipelines)[:2]
+    calculations[keptPipeline]["lineComments"]["0"] = "kept"
+    calculations[rerunPipeline][fingerprintKey] = "outdated"
+    SaveResultStore(calculations, StorePath(settings))
+
+    assert CreateSkeletonFiles(settings, imageFileName, "plate") == [rerunPipeline]
+    assert LoadCalculations(StorePath(settings))[keptPipeline]["lineComments"] == {"0": "kept"}
+
+def test_missing_skeleton_image_reruns_pipeline(settings):
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+
+    pipelineKey = next(iter(settings.pipelines))
+    os.remove(LoadCalculations(StorePath(settings))[pipelineKey]["skeleton"])
+
+    assert CreateSkeletonFiles(settings, imageFileName, "plate") == [pipelineKey]
+
+def test_skipped_run_exports_missing_or_outdated_json(settings):
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+    assert not os.path.exists(JSONPath(settings))
+
+    settings.exportJSON = True
+    assert CreateSkeletonFiles(settings, imageFileName, "plate") == []
+    assert LoadCalculations(JSONPath(settings)) == LoadCalculations(StorePath(settings))
+
+    #a store newer than the export is exported again
+    jsonState = os.stat(JSONPath(settings)).st_mtime_ns
+    newTime = jsonState + 10**9
+    os.utime(StorePath(settings), ns=(newTime, newTime))
+
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+    assert os.stat(JSONPath(settings)).st_mtime_ns > jsonState
+
+def test_json_export_removed_when_turned_off(settings):
+    settings.exportJSON = True
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+    assert os.path.exists(JSONPath(settings))
+
+    #only a run that saves results removes the export
+    settings.exportJSON = False
+    inputPath = os.path.join(settings.inputDirectory, imageFileName)
+    newTime = os.stat(inputPath).st_mtime_ns + 10**9
+    os.utime(inputPath, ns=(newTime, newTime))
+    CreateSkeletonFiles(settings, imageFileName, "plate")
+
+    assert not os.path.exists(JSONPath(settings))
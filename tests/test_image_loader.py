@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+from PIL import Image
+
+from source.Helpers.ImageLoader import ImageCache, DecodeNormalizedImage
+
+def WriteImage(path:str, seed:int, size:int=16) -> str:
+    generator = np.random.default_rng(seed)
+    Image.fromarray(generator.integers(0, 256, (size, size), dtype=np.uint8), mode="L").save(path)
+
+    return path
+
+@pytest.fixture
+def imagePaths(tmp_path) -> list[str]:
+    return [WriteImage(str(tmp_path / f"image_{index}.png"), index) for index in range(3)]
+
+#a 16 x 16 float64 image
+imageBytes = 16 * 16 * 8
+
+def test_cached_image_is_shared_and_read_only(imagePaths):
+    cache = ImageCache(10 * imageBytes)
+
+    first = cache.Get(imagePaths[0])
+    assert cache.Get(imagePaths[0]) is first
+    assert not first.flags.writeable
+    assert np.array_equal(first, DecodeNormalizedImage(imagePaths[0]))
+
+def test_least_recently_used_images_are_evicted(imagePaths):
+    cache = ImageCache(2 * imageBytes)
+
+    first = cache.Get(imagePaths[0])
+    cache.Get(imagePaths[1])
+    cache.Get(imagePaths[0])
+    cache.Get(imagePaths[2])
+
+    assert cache.totalBytes == 2 * imageBytes
+    assert cache.Get(imagePaths[0]) is first
+    assert [key[0] for key in cache.entries] == [os.path.abspath(imagePaths[index]) for index in [2, 0]]
+
+def test_images_larger_than_the_cache_are_not_kept(imagePaths):
+    cache = ImageCache(imageBytes - 1)
+    cache.Get(imagePaths[0])
+
+    assert len(cache.entries) == 0
+    assert cache.totalBytes == 0
+
+def test_edited_file_replaces_its_old_version(imagePaths):
+    cache = ImageCache(10 * imageBytes)
+    first = cache.Get(imagePaths[0])
+
+    WriteImage(imagePaths[0], 100)
+    newTime = os.stat(imagePaths[0]).st_mtime_ns + 10**9
+    os.utime(imagePaths[0], ns=(newTime, newTime))
+
+    second = cache.Get(imagePaths[0])
+    assert not np.array_equal(first, second)
+    assert len(cache.entries) == 1
+    assert cache.totalBytes == imageBytes
+
+def test_shrinking_the_cache_evicts(imagePaths):
+    cache = ImageCache(10 * imageBytes)
+    for path in imagePaths:
+        cache.Get(path)
+
+    cache.SetMaxBytes(imageBytes)
+    assert [key[0] for key in cache.entries] == [os.path.abspath(imagePaths[2])]
+
+    cache.SetMaxBytes(0)
+    assert len(cache.entries) == 0
+    assert cache.totalBytes == 0
+
+def test_data_types_are_cached_separately(imagePaths):
+    cache = ImageCache(10 * imageBytes)
+
+    assert cache.Get(imagePaths[0], dataType=np.float32).dtype == np.float32
+    assert cache.Get(imagePaths[0]).dtype == np.float64
+    assert len(cache.entries) == 2
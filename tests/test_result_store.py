@@ -0,0 +1,153 @@
+import os
+
+import numpy as np
+import pytest
+
+from source.Helpers.HelperFunctions import vectorKey, pointsKey, linesKey, clusterKey
+from source.Helpers.ResultStore import (SaveResultStore, ResultStore, LoadCalculations, LoadCalculationsMetadata, LoadCalculationsPipeline,
+                                        ExportCalculationsJSON, CalculationsCache, CalculationsPath, calculationsStoreSuffix, calculationsJSONSuffix)
+
+def PipelineResult(seed:int) -> dict:
+    generator = np.random.default_rng(seed)
+    points = generator.random((12, 2)).tolist()
+
+    return {
+        "skeleton": f"skeleton_{seed}.png",
+        vectorKey: {
+            pointsKey: points,
+            linesKey: [[0, 1, 2, 3], [3, 4], [5, 6, 7, 8, 9], [], [10, 11]],
+            clusterKey: [[0, 1], [2], [4]]
+        },
+        "fractalDimension": float(generator.random()),
+        "linesInImage": 5,
+        "centerLineWidth": generator.random(5).tolist(),
+        "isLineStraight": [True, False, True, True, False],
+        "linesInCluster": [2, 1, 1],
+        "lineComments": {"0": "first line"},
+        "clusterComments": {},
+        "fingerprint": f"fingerprint_{seed}"
+    }
+
+def Calculations() -> dict:
+    return {
+        "originalImage": "plate_100.png",
+        "first": PipelineResult(0),
+        "second": PipelineResult(1),
+        "timestamp": 100,
+        "sample": "plate"
+    }
+
+def StorePath(tmp_path) -> str:
+    return str(tmp_path / ("plate_100" + calculationsStoreSuffix))
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_store_round_trip(tmp_path, compress):
+    calculations = Calculations()
+    SaveResultStore(calculations, StorePath(tmp_path), compress)
+
+    loaded = LoadCalculations(StorePath(tmp_path))
+
+    #points are stored as float64, so they come back exactly
+    assert loaded == calculations
+    assert list(loaded) == list(calculations)
+    assert list(loaded["first"]) == list(calculations["first"])
+
+def test_metadata_leaves_out_arrays(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+
+    metadata = LoadCalculationsMetadata(StorePath(tmp_path))
+
+    assert metadata["sample"] == "plate"
+    assert metadata["first"]["fingerprint"] == "fingerprint_0"
+    assert vectorKey not in metadata["first"]
+    assert "centerLineWidth" not in metadata["first"]
+
+def test_single_pipeline_load(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+
+    assert LoadCalculationsPipeline(StorePath(tmp_path), "second") == Calculations()["second"]
+
+def test_json_export_round_trip(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+
+    jsonPath = ExportCalculationsJSON(StorePath(tmp_path))
+
+    assert jsonPath.endswith(calculationsJSONSuffix)
+    assert LoadCalculations(jsonPath) == Calculations()
+    assert LoadCalculationsPipeline(jsonPath, "first") == Calculations()["first"]
+
+def test_json_file_used_when_there_is_no_store(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+    jsonPath = ExportCalculationsJSON(StorePath(tmp_path))
+
+    assert CalculationsPath(str(tmp_path), "plate_100") == StorePath(tmp_path)
+
+    os.remove(StorePath(tmp_path))
+    assert CalculationsPath(str(tmp_path), "plate_100") == jsonPath
+
+def test_unsupported_version_is_rejected(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+
+    with ResultStore(StorePath(tmp_path)) as store:
+        arrays = {key: store.archive[key] for key in store.archive.files}
+
+    arrays["metadata"] = np.frombuffer(b'{"version": -1, "calculations": {}}', dtype=np.uint8)
+    with open(StorePath(tmp_path), "wb") as storeFile:
+        np.savez(storeFile, **arrays)
+
+    with pytest.raises(ValueError):
+        LoadCalculations(StorePath(tmp_path))
+
+def test_cache_only_loads_requested_pipelines(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+    cache = CalculationsCache(4)
+
+    partial = cache.Get(StorePath(tmp_path), ["second"])
+    assert "first" not in partial
+    assert partial["second"] == Calculations()["second"]
+    assert partial["sample"] == "plate"
+
+    assert cache.Get(StorePath(tmp_path)) == Calculations()
+
+def test_cache_reloads_replaced_file(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+    cache = CalculationsCache(4)
+    cache.Get(StorePath(tmp_path))
+
+    calculations = Calculations()
+    calculations["sample"] = "replaced"
+    SaveResultStore(calculations, StorePath(tmp_path))
+
+    assert cache.Get(StorePath(tmp_path))["sample"] == "replaced"
+
+def test_cache_save_updates_file_and_cache(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+    cache = CalculationsCache(4)
+
+    calculations = cache.Get(StorePath(tmp_path))
+    calculations["first"]["lineComments"]["1"] = "second line"
+    cache.Save(calculations, StorePath(tmp_path), exportJSON=True)
+
+    assert cache.Get(StorePath(tmp_path))["first"]["lineComments"] == {"0": "first line", "1": "second line"}
+    assert LoadCalculations(StorePath(tmp_path)) == calculations
+    assert LoadCalculations(StorePath(tmp_path)[:-len(calculationsStoreSuffix)] + calculationsJSONSuffix) == calculations
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    paths = [str(tmp_path / f"plate_{index}{calculationsStoreSuffix}") for index in range(3)]
+    for path in paths:
+        SaveResultStore(Calculations(), path)
+
+    cache = CalculationsCache(2)
+    cache.Get(paths[0])
+    cache.Get(paths[1])
+    cache.Get(paths[0])
+    cache.Get(paths[2])
+
+    assert list(cache.entries) == [os.path.abspath(paths[0]), os.path.abspath(paths[2])]
+
+def test_cache_without_entries(tmp_path):
+    SaveResultStore(Calculations(), StorePath(tmp_path))
+    cache = CalculationsCache(0)
+
+    assert cache.Get(StorePath(tmp_path)) == Calculations()
+    assert len(cache.entries) == 0
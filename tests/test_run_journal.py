@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from source.Helpers.BatchEngine import SkeletonJobSettings
+from source.Helpers.RunJournal import RunJournal, RunJournalPath, SettingsToJSON, SettingsFromJSON
+
+pipelines = {
+    "first": ([{"threshold": 0.5}], ["Threshold"]),
+    "second": ([{"sigma": 2}], ["Smooth Image"])
+}
+jobs = [("plate_0.png", "plate"), ("plate_1.png", "plate"), ("big_0.png", "big")]
+
+@pytest.fixture
+def settings(tmp_path) -> SkeletonJobSettings:
+    return SkeletonJobSettings(str(tmp_path / "Images"), str(tmp_path / "Skeletons"), pipelines, {}, compressResults=False, exportJSON=True)
+
+@pytest.fixture
+def journal(settings):
+    journal = RunJournal(RunJournalPath(settings.outputDirectory))
+    journal.Start(settings, jobs)
+
+    yield journal
+
+    journal.Close()
+
+def test_missing_journal_loads_as_none(tmp_path):
+    assert RunJournal(str(tmp_path / "runJournal.jsonl")).Load() is None
+
+def test_settings_round_trip(settings):
+    settingsData = json.loads(json.dumps(SettingsToJSON(settings)))
+    restored = SettingsFromJSON(settingsData, "cache", 10)
+
+    assert restored.pipelines == settings.pipelines
+    assert (restored.inputDirectory, restored.outputDirectory) == (settings.inputDirectory, settings.outputDirectory)
+    assert (restored.compressResults, restored.exportJSON, restored.precision) == (False, True, settings.precision)
+    assert (restored.stepCacheDirectory, restored.stepCacheSizeBytes) == ("cache", 10)
+
+def test_new_run_has_every_job_remaining(journal):
+    state = journal.Load()
+
+    assert state.jobs == jobs
+    assert state.RemainingJobs() == jobs
+    assert not state.finished
+
+def test_completed_images_are_not_remaining(journal):
+    journal.RecordCompleted("plate_0.png", ["first", "second"])
+
+    #an image is only done once every pipeline was saved
+    journal.RecordCompleted("plate_1.png", ["first"])
+
+    assert journal.Load().RemainingJobs() == jobs[1:]
+
+def test_finished_run(journal):
+    for fileName, _ in jobs:
+        journal.RecordCompleted(fileName, list(pipelines))
+    journal.RecordFinished()
+
+    state = journal.Load()
+    assert state.finished
+    assert state.RemainingJobs() == []
+
+def test_resume_after_torn_line(journal):
+    journal.RecordCompleted("plate_0.png", ["first", "second"])
+    journal.Close()
+
+    #a crash partway through writing an entry
+    with open(journal.path, "a") as journalFile:
+        journalFile.write('{"image": "plate_1.png", "pipel')
+
+    assert journal.Load().RemainingJobs() == jobs[1:]
+
+    journal.Reopen()
+    journal.RecordCompleted("big_0.png", ["first", "second"])
+
+    assert journal.Load().RemainingJobs() == [("plate_1.png", "plate")]
+
+def test_start_replaces_previous_run(settings, journal):
+    journal.RecordCompleted("plate_0.png", ["first", "second"])
+    journal.Start(settings, jobs[:1])
+
+    state = journal.Load()
+    assert state.jobs == jobs[:1]
+    assert state.RemainingJobs() == jobs[:1]
+
+def test_unreadable_first_line_loads_as_none(journal):
+    journal.Close()
+
+    with open(journal.path, "w") as journalFile:
+        journalFile.write('{"run": {"settings"')
+
+    assert journal.Load() is None
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from scipy import ndimage
+from skimage.morphology import skeletonize
+
+from source.Helpers.GeometryContext import GeometryContext
+from source.Helpers.HelperFunctions import statFunctionMap, intermediateFunctionMap, functionKey, functionTypeKey, imageTypeKey, usesContextKey, inputsKey, geometryInputKey
+from source.Helpers.StatEvaluation import ResolveStatOrder, EvaluateStats
+from source.Helpers.VectorizeSkeleton import VectorizeSkeleton
+
+def SampleContext(seed:int=0) -> GeometryContext:
+    generator = np.random.default_rng(seed)
+    thresholded = ndimage.gaussian_filter(generator.random((96, 96)), 2) > 0.5
+    skeleton = skeletonize(thresholded).astype(np.int64)
+    lines, points, clusters = VectorizeSkeleton(skeleton)
+
+    return GeometryContext(skeleton, thresholded.astype(np.float64), lines, points, clusters)
+
+def ContextStat(inputs:list[str], function=lambda context: 0):
+    return {functionKey: function, functionTypeKey: imageTypeKey, "inImageSpace": False, usesContextKey: True, inputsKey: inputs}
+
+def test_inputs_come_before_the_stats_that_use_them():
+    order = ResolveStatOrder(list(statFunctionMap))
+
+    assert sorted(order) == sorted(set(statFunctionMap) | set(intermediateFunctionMap))
+    for key in order:
+        entry = statFunctionMap[key] if key in statFunctionMap else intermediateFunctionMap[key]
+        for inputKey in entry.get(inputsKey, []):
+            if inputKey in order:
+                assert order.index(inputKey) < order.index(key)
+
+def test_only_needed_intermediates_are_resolved():
+    assert ResolveStatOrder(["linesInImage"]) == ["linesInImage"]
+    assert ResolveStatOrder(["meanLineWidth"]) == ["distanceTransform", "lineWidthProfiles", "meanLineWidth"]
+
+def test_dependency_cycle_is_reported(monkeypatch):
+    monkeypatch.setitem(statFunctionMap, "cycleA", ContextStat([geometryInputKey, "cycleB"]))
+    monkeypatch.setitem(statFunctionMap, "cycleB", ContextStat(["cycleC"]))
+    monkeypatch.setitem(intermediateFunctionMap, "cycleC", {functionKey: lambda context: 0, inputsKey: ["cycleA"]})
+
+    with pytest.raises(ValueError, match="cycleA -> cycleB -> cycleC -> cycleA"):
+        ResolveStatOrder(["cycleA"])
+
+def test_stat_depending_on_itself_is_reported(monkeypatch):
+    monkeypatch.setitem(statFunctionMap, "selfCycle", ContextStat(["selfCycle"]))
+
+    with pytest.raises(ValueError, match="cycle"):
+        ResolveStatOrder(["linesInImage", "selfCycle"])
+
+def test_unknown_input_is_reported():
+    with pytest.raises(ValueError, match="Unknown"):
+        ResolveStatOrder(["notAStat"])
+
+def test_cycle_is_reported_before_anything_runs(monkeypatch):
+    calls = []
+    monkeypatch.setitem(statFunctionMap, "cycleA", ContextStat(["cycleB"], lambda context: calls.append("cycleA")))
+    monkeypatch.setitem(statFunctionMap, "cycleB", ContextStat(["cycleA"], lambda context: calls.append("cycleB")))
+
+    with pytest.raises(ValueError):
+        EvaluateStats(SampleContext(), ["linesInImage", "cycleA"])
+
+    assert calls == []
+
+def test_threaded_stats_match_sequential_stats():
+    sequential = EvaluateStats(SampleContext(), maxWorkers=1)
+    threaded = EvaluateStats(SampleContext(), maxWorkers=4)
+
+    assert list(sequential) == list(statFunctionMap)
+    assert threaded == sequential
+
+def test_only_requested_stats_are_returned():
+    context = SampleContext()
+    results = EvaluateStats(context, ["meanLineWidth", "linesInImage"])
+
+    assert sorted(results) == ["linesInImage", "meanLineWidth"]
+    assert results["linesInImage"] == len(context.lines)
+
+def test_stats_receive_their_inputs(monkeypatch):
+    #a stat can read the results of the stats it lists as inputs from the context
+    monkeypatch.setitem(statFunctionMap, "doubleLines", ContextStat(["linesInImage"], lambda context: 2 * context.GetValue("linesInImage")))
+
+    context = SampleContext()
+    assert EvaluateStats(context, ["doubleLines"], maxWorkers=4)["doubleLines"] == 2 * len(context.lines)
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+
+from source.Helpers.StepCache import StepCache
+
+def EntrySize(array:np.ndarray) -> int:
+    #size of the .npy file Put writes for array
+    return array.nbytes + 128
+
+@pytest.fixture
+def cache(tmp_path) -> StepCache:
+    return StepCache(str(tmp_path / "StepCache"), 3 * EntrySize(np.zeros(100)))
+
+def SetLastUse(cache:StepCache, key:str, timeNs:int) -> None:
+    os.utime(cache.EntryPath(key), ns=(timeNs, timeNs))
+
+def test_round_trip(cache):
+    array = np.arange(100, dtype=np.float64).reshape(10, 10)
+    cache.Put("entry", array)
+
+    loaded = cache.Get("entry")
+    assert loaded.dtype == array.dtype
+    assert np.array_equal(loaded, array)
+
+def test_missing_entry(cache):
+    assert cache.Get("missing") is None
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for index, key in enumerate(["a", "b", "c"]):
+        cache.Put(key, np.zeros(100))
+        SetLastUse(cache, key, (index + 1) * 10**9)
+
+    #reading an entry marks it as used
+    cache.Get("a")
+
+    cache.Put("d", np.zeros(100))
+
+    assert cache.Get("b") is None
+    assert all(cache.Get(key) is not None for key in ["a", "c", "d"])
+    assert cache.totalBytes <= cache.maxBytes
+
+def test_rewritten_entry_is_counted_once(cache):
+    for _ in range(5):
+        cache.Put("entry", np.zeros(100))
+
+    assert cache.totalBytes == os.path.getsize(cache.EntryPath("entry"))
+
+def test_existing_entries_are_counted(cache):
+    cache.Put("entry", np.zeros(100))
+
+    reopened = StepCache(cache.directory, cache.maxBytes)
+    assert reopened.totalBytes == cache.totalBytes
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = StepCache(str(tmp_path / "StepCache"), 0)
+    cache.Put("entry", np.zeros(100))
+
+    assert cache.Get("entry") is None
+    assert os.listdir(cache.directory) == []
+
+def test_failed_write_leaves_no_files(cache):
+    with pytest.raises(ValueError):
+        cache.Put("entry", np.array([object()]))
+
+    assert os.listdir(cache.directory) == []
+    assert cache.totalBytes == 0
+
+def test_step_key_depends_on_every_input():
+    key = StepCache.StepKey("upstream", "threshold", {"value": 0.5})
+
+    assert key == StepCache.StepKey("upstream", "threshold", {"value": 0.5})
+    assert key != StepCache.StepKey("other", "threshold", {"value": 0.5})
+    assert key != StepCache.StepKey("upstream", "smooth", {"value": 0.5})
+    assert key != StepCache.StepKey("upstream", "threshold", {"value": 0.6})
+
+def test_file_key_follows_contents(cache, tmp_path):
+    inputPath = str(tmp_path / "input.png")
+    with open(inputPath, "wb") as inputFile:
+        inputFile.write(b"first")
+
+    firstKey = cache.FileKey(inputPath)
+
+    with open(inputPath, "wb") as inputFile:
+        inputFile.write(b"second")
+    newTime = os.stat(inputPath).st_mtime_ns + 10**9
+    os.utime(inputPath, ns=(newTime, newTime))
+
+    assert cache.FileKey(inputPath) != firstKey
+
+    #only the latest version of each file is remembered
+    assert len(cache.fileHashes) == 1
@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+
+from collections import defaultdict, Counter, deque
+from scipy import ndimage
+from skimage.morphology import skeletonize
+
+from source.Helpers.VectorizeSkeleton import GetInitialLines, RemoveShortLines, NormalizePoints, SimplifyLines, remove_unused_points, merge_nearby_points, merge_polylines_at_unique_endpoints, GetClusters
+
+#the implementations these functions replaced, outputs are compared against them
+
+def OriginalMergePolylines(polylines: list[list[int]]) -> list[list[int]]:
+    point_usage = Counter(pt for poly in polylines for pt in poly)
+
+    endpoint_map = defaultdict(list)
+    for idx, poly in enumerate(polylines):
+        if poly:
+            endpoint_map[poly[0]].append(idx)
+            endpoint_map[poly[-1]].append(idx)
+
+    merged = [False] * len(polylines)
+    result = []
+
+    for i, poly_i in enumerate(polylines):
+        if merged[i] or not poly_i:
+            continue
+
+        current_polyline = poly_i[:]
+        changed = True
+
+        while changed:
+            changed = False
+            for endpoint in [current_polyline[0], current_polyline[-1]]:
+                if point_usage[endpoint] != 2:
+                    continue
+
+                connections = [j for j in endpoint_map[endpoint] if not merged[j]]
+                if len(connections) != 2:
+                    continue
+
+                other_idx = [j for j in connections if j != i]
+                if not other_idx:
+                    continue
+                j = other_idx[0]
+                poly_j = polylines[j]
+
+                if endpoint == current_polyline[0]:
+                    if endpoint == poly_j[0]:
+                        poly_j = poly_j[::-1]
+                    current_polyline = poly_j[:-1] + current_polyline
+                elif endpoint == current_polyline[-1]:
+                    if endpoint == poly_j[-1]:
+                        poly_j = poly_j[::-1]
+                    current_polyline = current_polyline + poly_j[1:]
+                else:
+                    continue
+
+                merged[j] = True
+                changed = True
+
+                i = i if i < j else j
+                break
+
+        merged[i] = True
+        result.append(current_polyline)
+
+    return result
+
+def OriginalGetClusters(lines) -> list[list[int]]:
+    point_to_polylines = {}
+    for i, polyline in enumerate(lines):
+        for point in polyline:
+            if point not in point_to_polylines:
+                point_to_polylines[point] = set()
+
+            point_to_polylines[point].add(i)
+
+    graph = {}
+    for i, polyline in enumerate(lines):
+        if i not in graph:
+            graph[i] = set()
+
+        for point in polyline:
+            for neighbor in point_to_polylines[point]:
+                if neighbor != i:
+                    graph[i].add(neighbor)
+
+    visited = set()
+    clusters = []
+
+    for i in range(len(lines)):
+        if i not in visited:
+            queue = deque([i])
+            cluster_indices = []
+            while queue:
+                idx = queue.popleft()
+                if idx not in visited:
+                    visited.add(idx)
+                    cluster_indices.append(idx)
+                    queue.extend(graph[idx] - visited)
+            clusters.append(cluster_indices)
+
+    return clusters
+
+def RandomSkeleton(seed:int, size:int=160) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    blobs = ndimage.gaussian_filter(rng.random((size, size)), sigma=rng.uniform(1.5, 4.0))
+    return skeletonize(blobs > np.quantile(blobs, rng.uniform(0.4, 0.7))).astype(np.int64)
+
+def LinesBeforeMerging(skeleton:np.ndarray) -> tuple[list, list]:
+    #the steps VectorizeSkeleton runs before merging polylines
+    lines, points = GetInitialLines(skeleton)
+    lines = RemoveShortLines(lines, 5)
+    points = NormalizePoints(points, skeleton.shape[1], skeleton.shape[0])
+    lines, points = SimplifyLines(lines, points, 0.001)
+    lines, points = remove_unused_points(points, lines)
+    return merge_nearby_points(points, lines, 0.004)
+
+def RandomPolylines(seed:int) -> list[list[int]]:
+    #few distinct points so polylines share endpoints, interior points, and include empty, single point and closed polylines
+    rng = np.random.default_rng(seed)
+    numPoints = int(rng.integers(5, 60))
+    return [rng.integers(0, numPoints, size=int(rng.integers(0, 6))).tolist() for _ in range(int(rng.integers(1, 40)))]
+
+def SortedClusters(clusters:list[list[int]]) -> list[list[int]]:
+    return [sorted(cluster) for cluster in clusters]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_merge_polylines_matches_original_on_random_skeletons(seed):
+    lines, _ = LinesBeforeMerging(RandomSkeleton(seed))
+
+    assert merge_polylines_at_unique_endpoints(lines) == OriginalMergePolylines(lines)
+
+@pytest.mark.parametrize("seed", range(200))
+def test_merge_polylines_matches_original_on_random_polylines(seed):
+    polylines = RandomPolylines(seed)
+
+    assert merge_polylines_at_unique_endpoints(polylines) == OriginalMergePolylines(polylines)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_clusters_match_original_on_random_skeletons(seed):
+    lines, _ = LinesBeforeMerging(RandomSkeleton(seed))
+    lines = merge_polylines_at_unique_endpoints(lines)
+
+    clusters = GetClusters(lines)
+
+    #same clusters in the same order, lines within a cluster are in ascending order
+    assert clusters == SortedClusters(OriginalGetClusters(lines))
+    assert all(cluster == sorted(cluster) for cluster in clusters)
+
+@pytest.mark.parametrize("seed", range(200))
+def test_clusters_match_original_on_random_polylines(seed):
+    polylines = [polyline for polyline in RandomPolylines(seed)]
+
+    assert GetClusters(polylines) == SortedClusters(OriginalGetClusters(polylines))
+
+def test_empty_input():
+    assert merge_polylines_at_unique_endpoints([]) == []
+    assert GetClusters([]) == []